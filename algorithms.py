@@ -0,0 +1,528 @@
+#  ##### BEGIN GPL LICENSE BLOCK #####
+# 
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import random
+import functools
+from operations import COMPARE, SWAP, WRITE, READ, ALLOC, FREE, PUSH_RANGE, POP_RANGE, CHOOSE_PIVOT, HELD
+
+# Every algorithm is a generator over the element count. It yields each
+# operation as (kind, i, j, value), the same arguments a sink gets, and is
+# sent back the result: the sign of a compare or the value of a read.
+# A compare against a value it holds yields j as HELD. Extra memory is
+# taken with ALLOC and given back with FREE, and its cells are indexed
+# after the elements.
+
+CHOICES = (
+    ("Bubble", "sort_bubble"),
+    ("Bubble Optimized", "sort_bubble_optimize"),
+    ("Cocktail", "sort_cocktail"),
+    ("Cocktail Optimized", "sort_cocktail_optimize"),
+    ("Gnome", "sort_gnome"),
+    ("Insertion", "sort_insertion"),
+    ("Selection", "sort_selection"),
+    ("Shell", "sort_shell"),
+    ("Comb", "sort_comb"),
+    ("Cycle", "sort_cycle"),
+    ("Merge Top-Down", "sort_merge_top_down"),
+    ("Merge Bottom-Up", "sort_merge_bottom_up"),
+    ("Merge In-Place", "sort_merge_in_place"),
+)
+
+# Quicksort comes in every combination of partition scheme and pivot
+# choice, each named sort_quick_<partition>_<pivot>.
+QUICK_PARTITIONS = (
+    ("Lomuto", "lomuto"),
+    ("Hoare", "hoare"),
+    ("3-Way", "three_way"),
+    ("Dual", "dual_pivot"),
+)
+QUICK_PIVOTS = (
+    ("First", "first"),
+    ("Random", "random"),
+    ("Med3", "median3"),
+    ("Ninther", "ninther"),
+)
+CHOICES += tuple((f"Quick {partition_label}/{pivot_label}", f"sort_quick_{partition}_{pivot}")
+    for partition_label, partition in QUICK_PARTITIONS for pivot_label, pivot in QUICK_PIVOTS)
+
+
+def sort_bubble(num_elements):
+    done = False
+    while not done:
+        done = True
+        for i in range(num_elements-1):
+            if (yield COMPARE, i, i+1) > 0:
+                yield SWAP, i, i+1
+                done = False
+
+
+def sort_bubble_optimize(num_elements):
+    done = False
+    end = num_elements - 1
+    while not done:
+        done = True
+        for i in range(end):
+            if (yield COMPARE, i, i+1) > 0:
+                yield SWAP, i, i+1
+                done = False
+
+        end -= 1
+
+
+def sort_cocktail(num_elements):
+    done = False
+    while not done:
+        done = True
+
+        for i in range(num_elements-1):
+            if (yield COMPARE, i, i+1) > 0:
+                yield SWAP, i, i+1
+                done = False
+
+        for i in reversed(range(1, num_elements)):
+            if (yield COMPARE, i, i-1) < 0:
+                yield SWAP, i, i-1
+                done = False
+
+
+def sort_cocktail_optimize(num_elements):
+    done = False
+    start = 0
+    end = num_elements - 1
+    while not done:
+        done = True
+
+        for i in range(start, end):
+            if (yield COMPARE, i, i+1) > 0:
+                yield SWAP, i, i+1
+                done = False
+
+        for i in reversed(range(start+1, end+1)):
+            if (yield COMPARE, i, i-1) < 0:
+                yield SWAP, i, i-1
+                done = False
+
+        start += 1
+        end -= 1
+
+
+def sort_gnome(num_elements):
+    i = 0
+    while i < num_elements:
+        if i == 0 or (yield COMPARE, i, i-1) >= 0:
+            i += 1
+        else:
+            yield SWAP, i, i-1
+            i -= 1
+
+
+def sort_insertion(num_elements):
+    for i in range(1, num_elements):
+        key = yield READ, i
+        j = i - 1
+        while j >= 0 and (yield COMPARE, j, HELD, key) > 0:
+            yield WRITE, j+1, HELD, (yield READ, j)
+            j -= 1
+        yield WRITE, j+1, HELD, key
+
+
+def sort_selection(num_elements):
+    for i in range(num_elements):
+        min_index = i
+        for j in range(i+1, num_elements):
+            if (yield COMPARE, min_index, j) > 0:
+                min_index = j
+
+        if min_index != i:
+            yield SWAP, i, min_index
+
+
+def sort_shell(num_elements):
+    gap = num_elements // 2
+    while gap > 0:
+        for i in range(gap, num_elements):
+            tmp = yield READ, i
+            j = i
+            while j >= gap and (yield COMPARE, j-gap, HELD, tmp) > 0:
+                yield WRITE, j, HELD, (yield READ, j-gap)
+                j -= gap
+
+            yield WRITE, j, HELD, tmp
+        gap //= 2
+
+
+def sort_comb(num_elements):
+    def next_gap(gap):
+        gap = gap * 10 / 13
+        if gap < 1:
+            return 1
+        return int(gap)
+
+    gap = num_elements
+    swapped = True
+    while gap != 1 or swapped:
+        gap = next_gap(gap)
+        swapped = False
+
+        for i in range(num_elements-gap):
+            if (yield COMPARE, i, i+gap) > 0:
+                yield SWAP, i, i+gap
+                swapped = True
+
+
+def sort_cycle(num_elements):
+    for start in range(0, num_elements-1):
+        item = yield READ, start
+
+        pos = start
+        for i in range(start+1, num_elements):
+            if (yield COMPARE, i, HELD, item) < 0:
+                pos += 1
+
+        if pos == start:
+            continue
+
+        while (yield COMPARE, pos, HELD, item) == 0:
+            pos += 1
+
+        displaced = yield READ, pos
+        yield WRITE, pos, HELD, item
+        item = displaced
+
+        while pos != start:
+            pos = start
+            for i in range(start+1, num_elements):
+                if (yield COMPARE, i, HELD, item) < 0:
+                    pos += 1
+
+            while (yield COMPARE, pos, HELD, item) == 0:
+                pos += 1
+
+            displaced = yield READ, pos
+            yield WRITE, pos, HELD, item
+            item = displaced
+
+
+def merge(left, left_end, right, right_end, out):
+    """Merges the runs at left and right to out, taking ties from the left run first."""
+    while left < left_end and right < right_end:
+        if (yield COMPARE, right, left) < 0:
+            yield WRITE, out, HELD, (yield READ, right)
+            right += 1
+        else:
+            yield WRITE, out, HELD, (yield READ, left)
+            left += 1
+        out += 1
+
+    while left < left_end:
+        yield WRITE, out, HELD, (yield READ, left)
+        left += 1
+        out += 1
+    # Already in place when the right run ends where the output does.
+    while right < right_end and out != right:
+        yield WRITE, out, HELD, (yield READ, right)
+        right += 1
+        out += 1
+
+
+def sort_merge_top_down(num_elements):
+    # Each merge copies its left run to the buffer and merges it back, so
+    # the buffer never holds more than half the elements.
+    def sort(lo, hi):
+        if hi - lo < 2:
+            return
+        mid = (lo+hi) // 2
+        yield from sort(lo, mid)
+        yield from sort(mid, hi)
+        if (yield COMPARE, mid-1, mid) <= 0:
+            return
+
+        buffer = num_elements
+        yield ALLOC, mid-lo
+        for k in range(mid-lo):
+            yield WRITE, buffer+k, HELD, (yield READ, lo+k)
+        yield from merge(buffer, buffer+mid-lo, mid, hi, lo)
+        yield FREE, mid-lo
+
+    yield from sort(0, num_elements)
+
+
+def sort_merge_bottom_up(num_elements):
+    # Runs of doubling width are merged back and forth between the elements
+    # and a buffer as long as them.
+    yield ALLOC, num_elements
+    source, target = 0, num_elements
+    width = 1
+    while width < num_elements:
+        for lo in range(0, num_elements, 2*width):
+            mid = min(lo+width, num_elements)
+            hi = min(lo+2*width, num_elements)
+            yield from merge(source+lo, source+mid, source+mid, source+hi, target+lo)
+        source, target = target, source
+        width *= 2
+
+    if source != 0:
+        for k in range(num_elements):
+            yield WRITE, k, HELD, (yield READ, num_elements+k)
+    yield FREE, num_elements
+
+
+def sort_merge_in_place(num_elements):
+    # Merges without a buffer: the left run is cut at a pivot, the part of
+    # the right run that belongs before it is rotated in front of it, and
+    # both sides are merged the same way.
+    def reverse(lo, hi):
+        hi -= 1
+        while lo < hi:
+            yield SWAP, lo, hi
+            lo += 1
+            hi -= 1
+
+    def rotate(lo, mid, hi):
+        if lo == mid or mid == hi:
+            return
+        yield from reverse(lo, mid)
+        yield from reverse(mid, hi)
+        yield from reverse(lo, hi)
+
+    def bound(lo, hi, pivot, upper):
+        # First index in [lo, hi) above the pivot, or not below it for the lower bound.
+        while lo < hi:
+            mid = (lo+hi) // 2
+            order = yield COMPARE, mid, pivot
+            if order < 0 or (upper and order == 0):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def merge_in_place(lo, mid, hi):
+        if lo == mid or mid == hi:
+            return
+        if hi - lo == 2:
+            if (yield COMPARE, mid, lo) < 0:
+                yield SWAP, lo, mid
+            return
+
+        if mid - lo > hi - mid:
+            left_cut = (lo+mid) // 2
+            right_cut = yield from bound(mid, hi, left_cut, False)
+        else:
+            right_cut = (mid+hi) // 2
+            left_cut = yield from bound(lo, mid, right_cut, True)
+        yield from rotate(left_cut, mid, right_cut)
+        new_mid = left_cut + right_cut - mid
+        yield from merge_in_place(lo, left_cut, new_mid)
+        yield from merge_in_place(new_mid, right_cut, hi)
+
+    def sort(lo, hi):
+        if hi - lo < 2:
+            return
+        mid = (lo+hi) // 2
+        yield from sort(lo, mid)
+        yield from sort(mid, hi)
+        if (yield COMPARE, mid-1, mid) > 0:
+            yield from merge_in_place(lo, mid, hi)
+
+    yield from sort(0, num_elements)
+
+
+def median_of_three(a, b, c):
+    """Index of the median of the elements at a, b and c."""
+    if (yield COMPARE, a, b) > 0:
+        a, b = b, a
+    if (yield COMPARE, b, c) <= 0:
+        return b
+    if (yield COMPARE, a, c) > 0:
+        return a
+    return c
+
+
+def choose_pivot(pivot, lo, hi, rng):
+    if pivot == "first" or hi - lo < 3:
+        return lo
+    if pivot == "random":
+        return rng.randrange(lo, hi)
+
+    mid = (lo+hi) // 2
+    if pivot == "ninther" and hi - lo >= 40:
+        # Tukey's ninther, the median of the medians of three groups of three.
+        step = (hi-lo) // 8
+        left = yield from median_of_three(lo, lo+step, lo+2*step)
+        middle = yield from median_of_three(mid-step, mid, mid+step)
+        right = yield from median_of_three(hi-1-2*step, hi-1-step, hi-1)
+        return (yield from median_of_three(left, middle, right))
+    return (yield from median_of_three(lo, mid, hi-1))
+
+
+def partition_lomuto(lo, hi, pivot):
+    # Elements equal to the pivot all go right, so many duplicates make the
+    # parts lopsided.
+    last = hi - 1
+    if pivot != last:
+        yield SWAP, pivot, last
+    store = lo
+    for i in range(lo, last):
+        if (yield COMPARE, i, last) < 0:
+            if i != store:
+                yield SWAP, i, store
+            store += 1
+    if store != last:
+        yield SWAP, store, last
+    return [(lo, store), (store+1, hi)]
+
+
+def partition_hoare(lo, hi, pivot):
+    # With the pivot at lo both parts are never empty.
+    if pivot != lo:
+        yield SWAP, pivot, lo
+    value = yield READ, lo
+    i, j = lo - 1, hi
+    while True:
+        i += 1
+        while (yield COMPARE, i, HELD, value) < 0:
+            i += 1
+        j -= 1
+        while (yield COMPARE, j, HELD, value) > 0:
+            j -= 1
+        if i >= j:
+            return [(lo, j+1), (j+1, hi)]
+        yield SWAP, i, j
+
+
+def partition_three_way(lo, hi, pivot):
+    # Dijkstra's scheme: everything equal to the pivot ends in the middle
+    # and is done, so duplicates make the parts smaller instead.
+    value = yield READ, pivot
+    less, i, greater = lo, lo, hi
+    while i < greater:
+        order = yield COMPARE, i, HELD, value
+        if order < 0:
+            if i != less:
+                yield SWAP, i, less
+            less += 1
+            i += 1
+        elif order > 0:
+            greater -= 1
+            yield SWAP, i, greater
+        else:
+            i += 1
+    return [(lo, less), (greater, hi)]
+
+
+def partition_dual_pivot(lo, hi, first, second):
+    # Yaroslavskiy's scheme, with the pivots at the ends: elements below the
+    # first go left, above the second go right, the rest in between.
+    last = hi - 1
+    if first != lo:
+        yield SWAP, first, lo
+    if second != last:
+        yield SWAP, second, last
+    order = yield COMPARE, lo, last
+    if order > 0:
+        yield SWAP, lo, last
+
+    low = yield READ, lo
+    high = yield READ, last
+    less, greater = lo + 1, last - 1
+    k = less
+    while k <= greater:
+        if (yield COMPARE, k, HELD, low) < 0:
+            if k != less:
+                yield SWAP, k, less
+            less += 1
+        elif (yield COMPARE, k, HELD, high) > 0:
+            while k < greater and (yield COMPARE, greater, HELD, high) > 0:
+                greater -= 1
+            if k != greater:
+                yield SWAP, k, greater
+            greater -= 1
+            if (yield COMPARE, k, HELD, low) < 0:
+                if k != less:
+                    yield SWAP, k, less
+                less += 1
+        k += 1
+
+    less -= 1
+    greater += 1
+    if less != lo:
+        yield SWAP, lo, less
+    if greater != last:
+        yield SWAP, last, greater
+    # With equal pivots the middle only holds their value.
+    if order == 0:
+        return [(lo, less), (greater+1, hi)]
+    return [(lo, less), (less+1, greater), (greater+1, hi)]
+
+
+def choose_dual_pivots(pivot, lo, hi, rng):
+    # One pivot from each half, or the ends as in Yaroslavskiy's original.
+    if pivot == "first":
+        return lo, hi-1
+    mid = (lo+hi) // 2
+    first = yield from choose_pivot(pivot, lo, mid, rng)
+    second = yield from choose_pivot(pivot, mid, hi, rng)
+    return first, second
+
+
+PARTITIONS = {
+    "lomuto": partition_lomuto,
+    "hoare": partition_hoare,
+    "three_way": partition_three_way,
+}
+
+
+def sort_quick(partition, pivot, num_elements):
+    # The ranges still to sort wait on a stack rather than in recursive
+    # calls. The larger part goes on first so the smaller one is sorted
+    # first, which keeps the stack to about log2(n) ranges while the depth
+    # of the ranges shows how unbalanced the partitions are. The random
+    # pivots are seeded, so every run of the same input is the same.
+    rng = random.Random(0)
+    stack = []
+    if num_elements > 1:
+        yield PUSH_RANGE, 0
+        stack.append((0, num_elements, 0))
+    while stack:
+        lo, hi, depth = stack.pop()
+        yield POP_RANGE, depth
+        if partition == "dual_pivot":
+            first, second = yield from choose_dual_pivots(pivot, lo, hi, rng)
+            yield CHOOSE_PIVOT, first, second
+            parts = yield from partition_dual_pivot(lo, hi, first, second)
+        else:
+            index = yield from choose_pivot(pivot, lo, hi, rng)
+            yield CHOOSE_PIVOT, index
+            parts = yield from PARTITIONS[partition](lo, hi, index)
+
+        for start, stop in sorted(parts, key=lambda part: part[0]-part[1]):
+            if stop - start > 1:
+                yield PUSH_RANGE, depth+1
+                stack.append((start, stop, depth+1))
+
+
+QUICK_SORTS = {f"sort_quick_{partition}_{pivot}": functools.partial(sort_quick, partition, pivot)
+    for partition_label, partition in QUICK_PARTITIONS for pivot_label, pivot in QUICK_PIVOTS}
+
+
+def lookup(name):
+    """Returns the algorithm listed in CHOICES as name."""
+    if name in QUICK_SORTS:
+        return QUICK_SORTS[name]
+    if name.startswith("sort_") and name in globals():
+        return globals()[name]
+    raise KeyError(name)
@@ -0,0 +1,139 @@
+#  ##### BEGIN GPL LICENSE BLOCK #####
+# 
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import sys
+import json
+import time
+import random
+import argparse
+import functools
+import algorithms
+from operations import OpCounter, PlainArray, TracedArray, execute
+
+try:
+    import distributions
+except ImportError:
+    distributions = None
+
+DEFAULT_SIZES = (16, 64, 256, 1024)
+
+
+def algorithm_names():
+    return [func[len("sort_"):] for label, func in algorithms.CHOICES]
+
+
+def gen_input(num_elements, seed):
+    elements = [i / num_elements for i in range(num_elements)]
+    random.Random(seed).shuffle(elements)
+    return elements
+
+
+def gen_sorted(num_elements, seed):
+    return [i / num_elements for i in range(num_elements)]
+
+
+def gen_reversed(num_elements, seed):
+    return [i / num_elements for i in range(num_elements-1, -1, -1)]
+
+
+DISTRIBUTIONS = {
+    "shuffled": gen_input,
+    "sorted": gen_sorted,
+    "reversed": gen_reversed,
+}
+# The other shapes need NumPy. Shuffled is gen_input everywhere, the input of
+# bench, costmodel and complexity, so a cached result for a seed always
+# stands for the same elements.
+if distributions is not None:
+    for name in distributions.GENERATORS:
+        DISTRIBUTIONS[name] = functools.partial(distributions.generate, name)
+
+
+def run(name, elements, instrumented=True):
+    # Without instrumentation the algorithm runs on a PlainArray, which only
+    # gives the time but does not slow the run down with the counting.
+    func = algorithms.lookup("sort_" + name)
+    counter = OpCounter()
+    array = TracedArray(elements, counter) if instrumented else PlainArray(elements)
+
+    start = time.perf_counter()
+    execute(func, array)
+    elapsed = time.perf_counter() - start
+
+    if array.values != sorted(elements):
+        raise RuntimeError(f"{name} did not sort {len(elements)} elements")
+
+    result = {"algorithm": name, "size": len(elements), "seconds": elapsed}
+    if instrumented:
+        result.update({
+            "ops": counter.ops,
+            "ops_per_sec": counter.ops / elapsed if elapsed > 0 else 0.0,
+            "comparisons": counter.comp,
+            "reads": counter.read,
+            "writes": counter.write,
+            "peak_aux": counter.peak_aux,
+            "peak_stack": counter.peak_stack,
+            "peak_depth": counter.peak_depth,
+        })
+    return result
+
+
+def format_table(results):
+    header = ("Algorithm", "Size", "Time (ms)", "Ops/sec", "Comparisons", "Reads", "Writes", "Peak Aux", "Peak Stack",
+        "Peak Depth")
+    rows = [header]
+    for r in results:
+        if "ops" in r:
+            rows.append((r["algorithm"], str(r["size"]), f"{r['seconds']*1000:.2f}", f"{r['ops_per_sec']:.0f}",
+                str(r["comparisons"]), str(r["reads"]), str(r["writes"]), str(r["peak_aux"]),
+                str(r["peak_stack"]), str(r["peak_depth"])))
+        else:
+            rows.append((r["algorithm"], str(r["size"]), f"{r['seconds']*1000:.2f}", "-", "-", "-", "-", "-", "-", "-"))
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    lines = []
+    for row in rows:
+        lines.append("  ".join(cell.ljust(widths[i]) if i == 0 else cell.rjust(widths[i]) for i, cell in enumerate(row)))
+    lines.insert(1, "  ".join("-"*w for w in widths))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    names = algorithm_names()
+    parser = argparse.ArgumentParser(description="Benchmark the sorting algorithms without the visualizer.")
+    parser.add_argument("-a", "--algorithms", nargs="+", choices=names, default=names, metavar="NAME",
+        help="algorithms to run (default: all): " + ", ".join(names))
+    parser.add_argument("-n", "--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="element counts")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="seed for the shuffled input")
+    parser.add_argument("--plain", action="store_true", help="time the algorithms without counting operations")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.algorithms:
+        for size in args.sizes:
+            results.append(run(name, gen_input(size, args.seed), not args.plain))
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_table(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#  ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import sys
+import math
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import bench
+
+try:
+    from matplotlib import pyplot
+except ImportError:
+    pyplot = None
+
+MODELS = (
+    ("n", lambda n: n),
+    ("n log n", lambda n: n * math.log2(n)),
+    ("n^1.5", lambda n: n ** 1.5),
+    ("n^2", lambda n: n ** 2),
+)
+METRICS = ("comparisons", "writes", "seconds")
+
+
+def geometric_sizes(low, high, factor=2):
+    sizes = []
+    size = low
+    while size <= high:
+        sizes.append(size)
+        size = int(size * factor)
+    return sizes
+
+
+def log2_factorial(n):
+    """Comparisons any comparison sort needs in the worst case, log2(n!)."""
+    return math.lgamma(n+1) / math.log(2)
+
+
+def run_size(name, size, seed):
+    return bench.run(name, bench.gen_input(size, seed))
+
+
+def fit_power(sizes, values):
+    """Least squares line through (log n, log y), returned as y = c * n^k."""
+    points = [(math.log(n), math.log(y)) for n, y in zip(sizes, values) if y > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, y in points) / len(points)
+    mean_y = sum(y for x, y in points) / len(points)
+    var = sum((x-mean_x)**2 for x, y in points)
+    exponent = sum((x-mean_x) * (y-mean_y) for x, y in points) / var
+    return exponent, math.exp(mean_y - exponent*mean_x)
+
+
+def fit_models(sizes, values):
+    """
+    Fits y = c * f(n) for every model in log space, so small and large sizes
+    weigh the same. Returns (name, c, error) sorted from the best fit, where
+    error is the spread of log(y / f(n)).
+    """
+    fits = []
+    for name, func in MODELS:
+        logs = [math.log(y / func(n)) for n, y in zip(sizes, values) if y > 0]
+        if not logs:
+            continue
+        mean = sum(logs) / len(logs)
+        error = math.sqrt(sum((x-mean)**2 for x in logs) / len(logs))
+        fits.append((name, math.exp(mean), error))
+    return sorted(fits, key=lambda fit: fit[2])
+
+
+def analyze(name, sizes, seed=0, jobs=None):
+    # The largest sizes are submitted first so they do not end up last on a
+    # single worker.
+    with ProcessPoolExecutor(jobs) as pool:
+        futures = {size: pool.submit(run_size, name, size, seed) for size in sorted(sizes, reverse=True)}
+        results = [futures[size].result() for size in sorted(sizes)]
+
+    report = {"algorithm": name, "runs": results, "fits": {}}
+    for metric in METRICS:
+        values = [r[metric] for r in results]
+        report["fits"][metric] = {"power": fit_power(sizes, values), "models": fit_models(sizes, values)}
+    return report
+
+
+def format_report(report):
+    lines = [f"{report['algorithm']}"]
+    header = ("Size", "Comparisons", "log2(n!)", "Ratio", "Writes", "Time (ms)")
+    rows = [header]
+    for r in report["runs"]:
+        bound = log2_factorial(r["size"])
+        rows.append((str(r["size"]), str(r["comparisons"]), f"{bound:.0f}", f"{r['comparisons']/bound:.2f}",
+            str(r["writes"]), f"{r['seconds']*1000:.2f}"))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    for row in rows:
+        lines.append("  ".join(cell.rjust(widths[i]) for i, cell in enumerate(row)))
+    lines.insert(2, "  ".join("-"*w for w in widths))
+
+    lines.append("")
+    for metric in METRICS:
+        fit = report["fits"][metric]
+        if fit["power"] is None:
+            lines.append(f"{metric}: not enough nonzero values to fit")
+            continue
+        exponent, constant = fit["power"]
+        model, model_constant, error = fit["models"][0]
+        lines.append(f"{metric}: ~ {constant:.3g} * n^{exponent:.2f}, best model {model_constant:.3g} * {model}"
+            f" (log error {error:.3f})")
+    return "\n".join(lines)
+
+
+def plot(report, path):
+    sizes = [r["size"] for r in report["runs"]]
+    figure, axes = pyplot.subplots(1, len(METRICS), figsize=(5*len(METRICS), 4))
+    for axis, metric in zip(axes, METRICS):
+        axis.loglog(sizes, [r[metric] for r in report["runs"]], "o", label="measured")
+        name, constant, error = report["fits"][metric]["models"][0]
+        func = dict(MODELS)[name]
+        axis.loglog(sizes, [constant*func(n) for n in sizes], "-", label=f"{constant:.3g} * {name}")
+        if metric == "comparisons":
+            axis.loglog(sizes, [log2_factorial(n) for n in sizes], "--", label="log2(n!)")
+        axis.set_title(metric)
+        axis.set_xlabel("n")
+        axis.legend()
+    figure.suptitle(report["algorithm"])
+    figure.tight_layout()
+    figure.savefig(path)
+
+
+def main(argv=None):
+    names = bench.algorithm_names()
+    parser = argparse.ArgumentParser(description="Fit the growth of an algorithm's costs over a range of sizes.")
+    parser.add_argument("algorithm", choices=names)
+    parser.add_argument("--min", type=int, default=16, help="smallest size (default: 16)")
+    parser.add_argument("--max", type=int, default=2048, help="largest size (default: 2048)")
+    parser.add_argument("--factor", type=float, default=2, help="ratio between sizes (default: 2)")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="seed for the shuffled input")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--plot", help="save a log-log plot to this file (needs matplotlib)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+    if args.min < 2 or args.factor <= 1:
+        parser.error("sizes must start at 2 or more and grow by a factor above 1")
+    if args.plot and pyplot is None:
+        parser.error("--plot needs matplotlib")
+
+    sizes = geometric_sizes(args.min, args.max, args.factor)
+    if len(sizes) < 2:
+        parser.error("at least two sizes are needed to fit")
+    report = analyze(args.algorithm, sizes, args.seed, args.jobs)
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_report(report))
+    if args.plot:
+        plot(report, args.plot)
+
+
+if __name__ == "__main__":
+    main()
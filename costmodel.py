@@ -0,0 +1,140 @@
+#  ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import os
+import sys
+import json
+import platform
+import argparse
+import bench
+
+CACHE_PATH = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser(os.path.join("~", ".cache"))),
+    "sortingvisualizer", "costs.json")
+SIZE = 128
+REPEATS = 5
+
+
+def cpu_name():
+    try:
+        with open("/proc/cpuinfo") as file:
+            for line in file:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def host_key():
+    return f"{platform.python_implementation()} {platform.python_version()} {sys.maxsize.bit_length()+1}bit | {cpu_name()}"
+
+
+class CostModel:
+    """
+    Seconds per operation of each algorithm, as (low, median, high) over the
+    calibration repeats. How much an operation costs depends mostly on the
+    algorithm around it, so an algorithm that was not measured gets the
+    spread over all of them.
+    """
+
+    def __init__(self, per_op):
+        self.per_op = per_op
+        times = sorted(cost for costs in per_op.values() for cost in costs)
+        self.overall = (times[0], times[len(times)//2], times[-1])
+
+    def estimate(self, counter, name=None):
+        """Returns the (low, median, high) seconds the counted operations take."""
+        return tuple(counter.ops * cost for cost in self.per_op.get(name, self.overall))
+
+    def to_dict(self):
+        return {"per_op": {name: list(costs) for name, costs in self.per_op.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls({name: tuple(costs) for name, costs in data["per_op"].items()})
+
+
+def calibrate(size=SIZE, repeats=REPEATS):
+    # The algorithms are timed the way bench runs them, on the TracedArray
+    # they run on in the visualizer, rather than from the bare list
+    # operations underneath it. The repeats are interleaved so a slow moment
+    # of the host spreads over every algorithm instead of skewing one.
+    names = bench.algorithm_names()
+    elements = bench.gen_input(size, 0)
+    samples = {name: [] for name in names}
+    for repeat in range(repeats):
+        for name in names:
+            result = bench.run(name, elements)
+            samples[name].append(result["seconds"] / max(result["ops"], 1))
+
+    per_op = {}
+    for name in names:
+        times = sorted(samples[name])
+        per_op["sort_" + name] = (times[0], times[len(times)//2], times[-1])
+    return CostModel(per_op)
+
+
+def read_cache(path=CACHE_PATH):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def is_cached(path=CACHE_PATH):
+    """Whether load will find the cost model of this host without calibrating."""
+    return host_key() in read_cache(path)
+
+
+def load(path=CACHE_PATH, recalibrate=False):
+    """Returns the cost model of this host, calibrating it the first time."""
+    cache = read_cache(path)
+    key = host_key()
+    if key in cache and not recalibrate:
+        try:
+            return CostModel.from_dict(cache[key])
+        except (KeyError, IndexError, TypeError, ValueError):
+            pass
+
+    model = calibrate()
+    cache[key] = model.to_dict()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f"{path}.{os.getpid()}"
+        with open(temp, "w") as file:
+            json.dump(cache, file, indent=2)
+        os.replace(temp, path)
+    except OSError:
+        pass
+    return model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the cost of an operation of each algorithm on this host.")
+    parser.add_argument("--recalibrate", action="store_true", help="measure again instead of using the cache")
+    args = parser.parse_args(argv)
+
+    model = load(recalibrate=args.recalibrate)
+    print(host_key())
+    for name, costs in model.per_op.items():
+        low, median, high = (x * 1e9 for x in costs)
+        print(f"{name[len('sort_'):]:24} {median:6.1f} ns/op  ({low:.1f} - {high:.1f})")
+
+
+if __name__ == "__main__":
+    main()
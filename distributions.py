@@ -0,0 +1,95 @@
+#  ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import numpy
+
+# Every generator takes the element count and a seed and returns values in
+# [0, 1). Apart from few_unique and gaussian they are permutations of the
+# ramp i/n the visualizer generates, so the same set can be shown sorted.
+# Shuffled and reversed inputs come from bench, which makes them without NumPy.
+
+
+def ramp(num_elements):
+    return numpy.arange(num_elements) / num_elements
+
+
+def dense(keys):
+    """The ramp ordered like keys, ties kept in index order."""
+    values = numpy.empty(len(keys))
+    values[numpy.argsort(keys, kind="stable")] = ramp(len(keys))
+    return values
+
+
+def shuffled(num_elements, seed):
+    return numpy.random.default_rng(seed).permutation(num_elements) / num_elements
+
+
+def nearly_sorted(num_elements, seed, swaps=None):
+    """The ramp with swaps (default n/100) disjoint pairs exchanged."""
+    if swaps is None:
+        swaps = max(num_elements // 100, 1)
+    swaps = min(swaps, num_elements // 2)
+    values = ramp(num_elements)
+    pos = numpy.random.default_rng(seed).choice(num_elements, 2*swaps, replace=False)
+    values[pos] = values[numpy.roll(pos, swaps)]
+    return values
+
+
+def few_unique(num_elements, seed, unique=8):
+    return numpy.random.default_rng(seed).integers(0, unique, num_elements) / unique
+
+
+def sawtooth(num_elements, seed, teeth=4):
+    """teeth ascending runs, each with every teeth-th value."""
+    index = numpy.arange(num_elements)
+    length = -(-num_elements // teeth)
+    return dense(index % length * teeth + index // length)
+
+
+def organ_pipe(num_elements, seed):
+    """Ascending to the middle, then descending."""
+    index = numpy.arange(num_elements)
+    mirror = num_elements - 1 - index
+    return dense(numpy.where(index < mirror, 2*index, 2*mirror + 1))
+
+
+def gaussian(num_elements, seed):
+    values = numpy.random.default_rng(seed).normal(0.5, 0.15, num_elements)
+    return numpy.clip(values, 0, 1 - 1/num_elements)
+
+
+def runs(num_elements, seed, length=32):
+    """A shuffled set with every length consecutive elements sorted."""
+    values = shuffled(num_elements, seed)
+    full = num_elements - num_elements % length
+    values[:full] = numpy.sort(values[:full].reshape(-1, length), axis=1).ravel()
+    values[full:] = numpy.sort(values[full:])
+    return values
+
+
+GENERATORS = {
+    "nearly_sorted": nearly_sorted,
+    "few_unique": few_unique,
+    "sawtooth": sawtooth,
+    "organ_pipe": organ_pipe,
+    "gaussian": gaussian,
+    "runs": runs,
+}
+
+
+def generate(name, num_elements, seed):
+    return GENERATORS[name](num_elements, seed).tolist()
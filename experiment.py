@@ -0,0 +1,153 @@
+#  ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import sys
+import json
+import argparse
+import itertools
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import algorithms
+import bench
+from operations import PlainArray, execute
+
+DEFAULT_CACHE = "experiments.jsonl"
+KEY_FIELDS = ("algorithm", "size", "distribution", "seed")
+
+
+def cell_key(cell):
+    return tuple(cell[field] for field in KEY_FIELDS)
+
+
+def peak_memory(name, elements):
+    """Bytes the algorithm allocates at most on top of the elements."""
+    array = PlainArray(elements)
+    tracemalloc.start()
+    try:
+        execute(algorithms.lookup("sort_" + name), array)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_cell(cell):
+    # Memory is measured in a second, uncounted run, so tracemalloc does not
+    # slow down the timed one.
+    elements = bench.DISTRIBUTIONS[cell["distribution"]](cell["size"], cell["seed"])
+    result = dict(cell)
+    result.update(bench.run(cell["algorithm"], elements))
+    result["peak_bytes"] = peak_memory(cell["algorithm"], elements)
+    return result
+
+
+def read_cache(path):
+    """Returns the finished results by key. A line cut off by an interruption is ignored."""
+    results = {}
+    try:
+        with open(path) as file:
+            for line in file:
+                try:
+                    result = json.loads(line)
+                    results[cell_key(result)] = result
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except FileNotFoundError:
+        pass
+    return results
+
+
+def run_matrix(cells, cache_path=DEFAULT_CACHE, jobs=None, progress=None):
+    """Runs every cell missing from the cache, appending each result as it finishes."""
+    results = read_cache(cache_path)
+    missing = [cell for cell in cells if cell_key(cell) not in results]
+    if missing:
+        with open(cache_path, "a") as file, ProcessPoolExecutor(jobs) as pool:
+            # Ends a line cut off by an interruption, so it does not swallow the next one.
+            if file.tell() > 0:
+                with open(cache_path, "rb") as last:
+                    last.seek(-1, 2)
+                    if last.read(1) != b"\n":
+                        file.write("\n")
+            futures = [pool.submit(run_cell, cell) for cell in missing]
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    result = future.result()
+                    file.write(json.dumps(result) + "\n")
+                    file.flush()
+                    results[cell_key(result)] = result
+                    if progress is not None:
+                        progress(done, len(missing))
+            except KeyboardInterrupt:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+    return [results[cell_key(cell)] for cell in cells]
+
+
+def format_table(results):
+    header = ("Algorithm", "Size", "Input", "Seed", "Time (ms)", "Comparisons", "Reads", "Writes", "Peak (KB)")
+    rows = [header]
+    for r in results:
+        rows.append((r["algorithm"], str(r["size"]), r["distribution"], str(r["seed"]), f"{r['seconds']*1000:.2f}",
+            str(r["comparisons"]), str(r["reads"]), str(r["writes"]), f"{r['peak_bytes']/1024:.1f}"))
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    lines = []
+    for row in rows:
+        lines.append("  ".join(cell.ljust(widths[i]) if i in (0, 2) else cell.rjust(widths[i])
+            for i, cell in enumerate(row)))
+    lines.insert(1, "  ".join("-"*w for w in widths))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    names = bench.algorithm_names()
+    distributions = list(bench.DISTRIBUTIONS)
+    parser = argparse.ArgumentParser(description="Run every combination of algorithms, sizes, inputs and seeds, "
+        "keeping the results so a later run only does what is missing.")
+    parser.add_argument("-a", "--algorithms", nargs="+", choices=names, default=names, metavar="NAME",
+        help="algorithms to run (default: all): " + ", ".join(names))
+    parser.add_argument("-n", "--sizes", type=int, nargs="+", default=bench.DEFAULT_SIZES, help="element counts")
+    parser.add_argument("-d", "--distributions", nargs="+", choices=distributions, default=distributions,
+        metavar="NAME", help="inputs (default: all): " + ", ".join(distributions))
+    parser.add_argument("-s", "--seeds", type=int, nargs="+", default=[0], help="seeds for the inputs")
+    parser.add_argument("-c", "--cache", default=DEFAULT_CACHE, help=f"results file (default: {DEFAULT_CACHE})")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    cells = [dict(zip(KEY_FIELDS, values))
+        for values in itertools.product(args.algorithms, args.sizes, args.distributions, args.seeds)]
+
+    def progress(done, total):
+        print(f"\r{done}/{total} runs", end="", file=sys.stderr, flush=True)
+
+    try:
+        results = run_matrix(cells, args.cache, args.jobs, progress)
+    except KeyboardInterrupt:
+        print("\nInterrupted, finished runs are kept in " + args.cache, file=sys.stderr)
+        sys.exit(1)
+    print(file=sys.stderr)
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_table(results))
+
+
+if __name__ == "__main__":
+    main()
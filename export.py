@@ -0,0 +1,181 @@
+#  ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import sys
+import math
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import pygame
+import version3
+from timeline import Timeline
+from tracefile import TraceError, TraceReader
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+MODES = [mode for label, mode in version3.ObjAppearance.choices]
+
+worker = {}
+
+
+def frame_path(directory, index):
+    return os.path.join(directory, f"frame_{index:05}.png")
+
+
+def init_worker(values, mode, image_path, scale, rect):
+    objects = version3.Objects(len(values))
+    objects.load(values)
+    worker["objects"] = objects
+    worker["mode"] = mode
+    worker["image"] = pygame.image.load(image_path) if image_path else None
+    worker["scale"] = scale
+    worker["rect"] = rect
+    worker["window"] = pygame.Surface(version3.SCREEN)
+
+
+def render_segment(state, stats, pivots, ops, start, frames, directory):
+    # Plays the segment through the same code as the window, so every frame
+    # is drawn with the highlights it would have had there. The counters
+    # are carried on from the start of the segment.
+    objects = worker["objects"]
+    window = worker["window"]
+    objects.objs.cells[:] = state
+    objects.timeline = Timeline(state, limit=None)
+    objects.timeline.restart_at(0, state, stats)
+    objects.timeline.extend(ops)
+    objects.position = 0
+    objects.stats = stats
+    objects.highlights.reset()
+    objects.highlights.pivots = pivots
+
+    for index, position, done in frames:
+        objects.consume(None, position - start - objects.position)
+        if done:
+            objects.finish()
+        window.fill(version3.BLACK)
+        objects.draw_elements(window, worker["mode"], worker["image"])
+        objects.draw_aux(window)
+        frame = window.subsurface(worker["rect"])
+        if worker["scale"] != 1:
+            size = [max(int(x * worker["scale"]), 1) for x in frame.get_size()]
+            frame = pygame.transform.smoothscale(frame, size)
+        pygame.image.save(frame, frame_path(directory, index))
+    return len(frames)
+
+
+def split_frames(timeline, ops_per_frame, num_tasks):
+    """Groups the frames by keyframe segment into about num_tasks tasks."""
+    total = len(timeline)
+    frames = [(index, position, False) for index, position in enumerate(range(0, total, ops_per_frame))]
+    frames.append((len(frames), total, False))
+    frames.append((len(frames), total, True))
+
+    tasks = []
+    per_task = math.ceil(len(frames) / num_tasks)
+    segment = None
+    for frame in frames:
+        # Each task starts one operation before its first frame, so that
+        # frame shows the highlight of the operation leading to it.
+        frame_segment = max(frame[1]-1, 0) // timeline.interval
+        if frame_segment != segment and (not tasks or len(tasks[-1]) >= per_task):
+            tasks.append([])
+        segment = frame_segment
+        tasks[-1].append(frame)
+    return tasks
+
+
+def export(trace, output, mode="BARS", ops_per_frame=None, num_frames=300, fps=30, jobs=None, image_path=None, scale=1):
+    # Frames are cut from the whole run, so none of it may be dropped.
+    timeline = Timeline(trace.values, limit=None)
+    timeline.extend(trace.ops())
+    if ops_per_frame is None:
+        ops_per_frame = max(math.ceil(len(timeline) / num_frames), 1)
+    jobs = jobs or os.cpu_count() or 1
+
+    gif = output.lower().endswith(".gif")
+    if gif and Image is None:
+        raise RuntimeError("GIF export needs Pillow, export to a directory of PNG frames instead")
+    directory = tempfile.mkdtemp() if gif else output
+    os.makedirs(directory, exist_ok=True)
+
+    # The strip of the auxiliary buffer is only included for runs that use one.
+    rect = pygame.Rect(version3.ELEMENTS_RECT)
+    if timeline.counter.peak_aux:
+        rect.union_ip(version3.AUX_RECT)
+
+    count = 0
+    with ProcessPoolExecutor(jobs, initializer=init_worker, initargs=(trace.values, mode, image_path, scale,
+            tuple(rect))) as pool:
+        futures = []
+        for frames in split_frames(timeline, ops_per_frame, jobs*4):
+            start = max(frames[0][1]-1, 0)
+            state = timeline.keyframes[0][:]
+            timeline.state_at(start, state)
+            futures.append(pool.submit(render_segment, state, timeline.stats_at(start), timeline.pivots_at(start),
+                timeline.ops(start, frames[-1][1]), start, frames, directory))
+        for future in futures:
+            count += future.result()
+
+    if gif:
+        paths = [frame_path(directory, index) for index in range(count)]
+        images = (Image.open(path) for path in paths[1:])
+        Image.open(paths[0]).save(output, save_all=True, append_images=images, duration=int(1000/fps), loop=0)
+        for path in paths:
+            os.remove(path)
+        os.rmdir(directory)
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a recorded trace as PNG frames or an animated GIF.")
+    parser.add_argument("trace", help="trace file saved by the visualizer or tracefile.py")
+    parser.add_argument("output", help="directory for PNG frames, or a .gif file")
+    parser.add_argument("-m", "--mode", type=str.upper, choices=MODES, default="BARS", help="visualization (default: BARS)")
+    parser.add_argument("-p", "--ops-per-frame", type=int, help="operations between frames (default: fit --frames)")
+    parser.add_argument("-f", "--frames", type=int, default=300, help="about how many frames to export (default: 300)")
+    parser.add_argument("--fps", type=float, default=30, help="GIF frame rate (default: 30)")
+    parser.add_argument("--scale", type=float, default=1, help="frame size relative to the window (default: 1)")
+    parser.add_argument("--image", help="image for the IMAGE mode")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes (default: one per core)")
+    args = parser.parse_args(argv)
+    if args.mode == "IMAGE" and args.image is None:
+        parser.error("the IMAGE mode needs --image")
+
+    try:
+        trace = TraceReader.load(args.trace)
+    except (OSError, TraceError) as e:
+        parser.error(f"cannot read {args.trace}: {e}")
+    try:
+        count = export(trace, args.output, args.mode, args.ops_per_frame, args.frames, args.fps, args.jobs,
+            args.image, args.scale)
+    except TraceError as e:
+        # Operations are only decoded by the export.
+        parser.error(f"cannot read {args.trace}: {e}")
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    print(f"{count} frames written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+#  ##### BEGIN GPL LICENSE BLOCK #####
+# 
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import time
+from array import array
+
+COMPARE = 0
+SWAP = 1
+WRITE = 2
+READ = 3
+# Add or drop i cells at the end of the auxiliary buffer. Buffer cell k is
+# index num_elements + k in every other operation.
+ALLOC = 4
+FREE = 5
+# A range put on or taken off the stack of ranges still to sort, with i the
+# depth of the range in the tree of subranges.
+PUSH_RANGE = 6
+POP_RANGE = 7
+# The elements at i and j, or at i alone with j HELD, become the pivots of
+# the range being partitioned until the next range is popped.
+CHOOSE_PIVOT = 8
+
+# Second index of a COMPARE against a value held outside the array.
+HELD = -1
+
+
+def reserve(cells, size):
+    """Grows cells, the elements followed by the auxiliary buffer, to at least size."""
+    if len(cells) < size:
+        cells.extend([0.0] * (size-len(cells)))
+
+
+class Elements:
+    """
+    Element values in a typed buffer, changed and drawn on the main loop
+    alone, so operations are applied to it in place. Past the elements, the
+    buffer holds the cells of the auxiliary buffer the algorithm has used so
+    far.
+    """
+
+    def __init__(self, values):
+        self.cells = array("d", values)
+        self.size = len(self.cells)
+
+    def __len__(self):
+        return self.size
+
+    def copy(self):
+        return self.cells[:self.size].tolist()
+
+
+class Pacer:
+    """
+    Turns a rate in operations per second into a whole number of operations
+    each time it is asked, carrying the fraction over to the next call.
+    """
+
+    # Stalls longer than this, like dragging the window, are not made up for.
+    max_step = 0.25
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.credit = 0.0
+        self.last = time.perf_counter()
+
+    def take(self):
+        now = time.perf_counter()
+        self.credit += self.rate * min(now-self.last, self.max_step)
+        self.last = now
+        count = int(self.credit)
+        self.credit -= count
+        return count
+
+
+class RateMeter:
+    """
+    Operations per second actually applied, over windows of about half a
+    second, and whether fewer were applied than were due in the last one.
+    """
+
+    window = 0.5
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.rate = None
+        self.short = False
+        self.due = 0
+        self.applied = 0
+        self.start = time.perf_counter()
+
+    def add(self, due, applied):
+        self.due += due
+        self.applied += applied
+        now = time.perf_counter()
+        if now - self.start >= self.window:
+            self.rate = self.applied / (now-self.start)
+            self.short = self.applied < self.due
+            self.due = 0
+            self.applied = 0
+            self.start = now
+
+
+class OpCounter:
+    def __init__(self):
+        self.ops = 0
+        self.comp = 0
+        self.read = 0
+        self.write = 0
+        # Cells of the auxiliary buffer in use, and the most at any time.
+        self.aux = 0
+        self.peak_aux = 0
+        # Ranges on the stack, and the depth of the range being sorted.
+        self.stack = 0
+        self.peak_stack = 0
+        self.depth = 0
+        self.peak_depth = 0
+
+    def push(self, kind, i, j=HELD, value=0.0):
+        self.ops += 1
+        if kind == COMPARE:
+            self.comp += 1
+            self.read += 1 if j == HELD else 2
+        elif kind == SWAP:
+            self.read += 2
+            self.write += 2
+        elif kind == WRITE:
+            self.write += 1
+        elif kind == READ:
+            self.read += 1
+        elif kind == ALLOC:
+            self.aux += i
+            self.peak_aux = max(self.peak_aux, self.aux)
+        elif kind == FREE:
+            self.aux -= i
+        elif kind == PUSH_RANGE:
+            self.stack += 1
+            self.peak_stack = max(self.peak_stack, self.stack)
+        elif kind == POP_RANGE:
+            self.stack -= 1
+            self.depth = i
+            self.peak_depth = max(self.peak_depth, i)
+
+    def pop(self, kind, i, j=HELD, value=0.0):
+        """Takes back the operation pushed last. The peaks and the depth are left as they are."""
+        self.ops -= 1
+        if kind == COMPARE:
+            self.comp -= 1
+            self.read -= 1 if j == HELD else 2
+        elif kind == SWAP:
+            self.read -= 2
+            self.write -= 2
+        elif kind == WRITE:
+            self.write -= 1
+        elif kind == READ:
+            self.read -= 1
+        elif kind == ALLOC:
+            self.aux -= i
+        elif kind == FREE:
+            self.aux += i
+        elif kind == PUSH_RANGE:
+            self.stack -= 1
+        elif kind == POP_RANGE:
+            self.stack += 1
+
+
+class TracedArray:
+    """
+    The only view of the elements an algorithm gets. Every access is
+    performed on a private copy and reported to the sink as an operation.
+    """
+
+    def __init__(self, values, sink):
+        self.values = list(values)
+        self.sink = sink
+
+    def __len__(self):
+        return len(self.values)
+
+    def read(self, i):
+        self.sink.push(READ, i)
+        return self.values[i]
+
+    def write(self, i, value):
+        self.sink.push(WRITE, i, HELD, value)
+        self.values[i] = value
+
+    def swap(self, i, j):
+        self.sink.push(SWAP, i, j)
+        values = self.values
+        values[i], values[j] = values[j], values[i]
+
+    def compare(self, i, j):
+        self.sink.push(COMPARE, i, j)
+        a, b = self.values[i], self.values[j]
+        return (a > b) - (a < b)
+
+    def compare_value(self, i, value):
+        self.sink.push(COMPARE, i, HELD, value)
+        a = self.values[i]
+        return (a > value) - (a < value)
+
+    def alloc(self, count):
+        self.sink.push(ALLOC, count)
+        self.values.extend([0.0] * count)
+
+    def free(self, count):
+        self.sink.push(FREE, count)
+        del self.values[len(self.values)-count:]
+
+    def push_range(self, depth):
+        self.sink.push(PUSH_RANGE, depth)
+
+    def pop_range(self, depth):
+        self.sink.push(POP_RANGE, depth)
+
+    def choose_pivot(self, i, j=HELD):
+        self.sink.push(CHOOSE_PIVOT, i, j)
+
+    def perform(self, kind, i, j=HELD, value=0.0):
+        if kind == COMPARE:
+            return self.compare(i, j) if j != HELD else self.compare_value(i, value)
+        elif kind == SWAP:
+            self.swap(i, j)
+        elif kind == WRITE:
+            self.write(i, value)
+        elif kind == READ:
+            return self.read(i)
+        elif kind == ALLOC:
+            self.alloc(i)
+        elif kind == FREE:
+            self.free(i)
+        elif kind == PUSH_RANGE:
+            self.push_range(i)
+        elif kind == POP_RANGE:
+            self.pop_range(i)
+        elif kind == CHOOSE_PIVOT:
+            self.choose_pivot(i, j)
+
+
+class PlainArray:
+    """
+    The same view as TracedArray without reporting anything, for running an
+    algorithm at full speed when its operations are not needed.
+    """
+
+    def __init__(self, values):
+        self.values = list(values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def read(self, i):
+        return self.values[i]
+
+    def write(self, i, value):
+        self.values[i] = value
+
+    def swap(self, i, j):
+        values = self.values
+        values[i], values[j] = values[j], values[i]
+
+    def compare(self, i, j):
+        a, b = self.values[i], self.values[j]
+        return (a > b) - (a < b)
+
+    def compare_value(self, i, value):
+        a = self.values[i]
+        return (a > value) - (a < value)
+
+    def alloc(self, count):
+        self.values.extend([0.0] * count)
+
+    def free(self, count):
+        del self.values[len(self.values)-count:]
+
+    def push_range(self, depth):
+        pass
+
+    def pop_range(self, depth):
+        pass
+
+    def choose_pivot(self, i, j=HELD):
+        pass
+
+    perform = TracedArray.perform
+
+
+def execute(func, array):
+    """Runs the algorithm func to the end on array."""
+    perform = array.perform
+    algorithm = func(len(array))
+    result = None
+    try:
+        while True:
+            result = perform(*algorithm.send(result))
+    except StopIteration:
+        pass
+
+
+class Run:
+    """
+    An algorithm advanced on demand by the main loop, instead of running
+    ahead on a thread. drain(limit) performs at most limit more operations
+    on a TracedArray and returns them; closing it cancels the algorithm
+    right away.
+    """
+
+    def __init__(self, func, values, sink):
+        self.array = TracedArray(values, sink)
+        self.algorithm = func(len(values))
+        self.result = None
+        self.finished = False
+
+    def drain(self, limit):
+        ops = []
+        if self.finished:
+            return ops
+        perform = self.array.perform
+        algorithm = self.algorithm
+        result = self.result
+        try:
+            for _ in range(limit):
+                op = algorithm.send(result)
+                result = perform(*op)
+                ops.append(op)
+        except StopIteration:
+            self.finished = True
+        self.result = result
+        return ops
+
+    def done(self):
+        return self.finished
+
+    def close(self):
+        self.algorithm.close()
+        self.finished = True
+
+
+def follow_pivots(pivots, kind, i, j):
+    if kind == SWAP:
+        return [j if pivot == i else i if pivot == j else pivot for pivot in pivots]
+    elif kind == CHOOSE_PIVOT:
+        return [i] if j == HELD else [i, j]
+    elif kind == POP_RANGE:
+        return []
+    return pivots
+
+
+# Highlight roles
+CURRENT = 0
+COMPARED = 1
+WRITTEN = 2
+PIVOT = 3
+SORTED = 4
+
+
+class Highlights:
+    """
+    The few elements marked with a role, plus whole regions such as the
+    sorted part, so nothing proportional to the element count is rebuilt
+    when the marks move. The pivots of the range being partitioned stay
+    marked from one batch of operations to the next, and whoever applies
+    the operations moves them along with follow.
+    """
+
+    def __init__(self):
+        self.marks = {}
+        self.regions = []
+        self.pivots = []
+
+    def reset(self):
+        self.marks = {}
+        self.regions = []
+        self.pivots = []
+
+    def clear(self):
+        """Removes all marks and returns the indices that were marked."""
+        cleared = list(self.marks)
+        self.marks = {}
+        return cleared
+
+    def mark(self, i, role):
+        self.marks[i] = role
+
+    def mark_region(self, start, stop, role):
+        self.regions.append((start, stop, role))
+
+    def clear_regions(self):
+        self.regions = []
+
+    def mark_op(self, kind, i, j):
+        if kind == COMPARE:
+            self.marks[i] = CURRENT
+            if j != HELD:
+                self.marks[j] = COMPARED
+        elif kind == SWAP:
+            self.marks[i] = WRITTEN
+            self.marks[j] = WRITTEN
+        elif kind == WRITE:
+            self.marks[i] = WRITTEN
+        elif kind == READ:
+            self.marks[i] = COMPARED
+        for pivot in self.pivots:
+            self.marks[pivot] = PIVOT
+
+    def follow(self, kind, i, j):
+        """Keeps the pivots on their elements through a SWAP, CHOOSE_PIVOT or POP_RANGE."""
+        self.pivots = follow_pivots(self.pivots, kind, i, j)
+
+    def role(self, i):
+        role = self.marks.get(i)
+        if role is None:
+            for start, stop, region_role in self.regions:
+                if start <= i < stop:
+                    return region_role
+        return role
@@ -0,0 +1,258 @@
+#  ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import os
+import time
+import tempfile
+import multiprocessing
+from array import array
+from multiprocessing import shared_memory
+import algorithms
+from operations import HELD, TracedArray, execute
+from tracefile import TraceWriter
+
+# Header words of the ring: operations written and read so far, flags, and
+# the processor time the finished algorithm took in nanoseconds.
+WRITTEN, READ_COUNT, FINISHED, CLOSED, ELAPSED = range(5)
+HEADER = 5 * 8
+BATCH = 1024
+
+
+class Ring:
+    """
+    Operations in parallel typed arrays over one shared memory block, written
+    by a single process and read by another. The counters only grow, so
+    positions are taken modulo the capacity, and the lock around them keeps
+    a batch from being seen before it is complete.
+    """
+
+    def __init__(self, memory, capacity, lock):
+        self.memory = memory
+        self.capacity = capacity
+        self.lock = lock
+        buf = memory.buf
+        self.header = buf[:HEADER].cast("q")
+        start = HEADER
+        self.kinds = buf[start:start+capacity].cast("b")
+        start += capacity
+        self.first = buf[start:start+8*capacity].cast("q")
+        start += 8 * capacity
+        self.second = buf[start:start+8*capacity].cast("q")
+        start += 8 * capacity
+        self.values = buf[start:start+8*capacity].cast("d")
+
+    @staticmethod
+    def size(capacity):
+        return HEADER + 25*capacity
+
+    def release(self):
+        for view in (self.header, self.kinds, self.first, self.second, self.values):
+            view.release()
+
+    def get(self, word):
+        with self.lock:
+            return self.header[word]
+
+    def set(self, word, value):
+        with self.lock:
+            self.header[word] = value
+
+    def free(self):
+        with self.lock:
+            return self.capacity - (self.header[WRITTEN] - self.header[READ_COUNT])
+
+    def write(self, kinds, first, second, values):
+        pos = self.header[WRITTEN] % self.capacity
+        count = len(kinds)
+        split = min(count, self.capacity - pos)
+        for ring, batch in ((self.kinds, kinds), (self.first, first), (self.second, second), (self.values, values)):
+            ring[pos:pos+split] = batch[:split]
+            ring[:count-split] = batch[split:]
+        with self.lock:
+            self.header[WRITTEN] += count
+
+    def slice(self, start, count):
+        """The count operations from the start-th one written, as tuples."""
+        pos = start % self.capacity
+        split = min(count, self.capacity - pos)
+        columns = []
+        for ring in (self.kinds, self.first, self.second, self.values):
+            columns.append(ring[pos:pos+split].tolist() + ring[:count-split].tolist())
+        return list(zip(*columns))
+
+    def read(self, limit):
+        with self.lock:
+            start = self.header[READ_COUNT]
+            count = min(limit, self.header[WRITTEN] - start)
+        ops = self.slice(start, count)
+        with self.lock:
+            self.header[READ_COUNT] = start + count
+        return ops
+
+
+class RingWriter:
+    """
+    Sink of the child process, handing operations over in batches. With a
+    trace, it also records each operation once the main loop has read it,
+    so a stopped run is recorded as far as it was shown.
+    """
+
+    def __init__(self, ring, trace=None):
+        self.ring = ring
+        self.trace = trace
+        self.traced = 0
+        # Processor time spent recording, which is not the algorithm's.
+        self.recording = 0
+        self.kinds = array("b")
+        self.first = array("q")
+        self.second = array("q")
+        self.values = array("d")
+
+    def push(self, kind, i, j=HELD, value=0.0):
+        self.kinds.append(kind)
+        self.first.append(i)
+        self.second.append(j)
+        self.values.append(value)
+        if len(self.kinds) >= BATCH:
+            self.flush()
+
+    def record(self):
+        # The operations read since the last call are still in the ring
+        # until the next batch is written over them.
+        stop = self.ring.get(READ_COUNT)
+        if self.trace is None or stop == self.traced:
+            return
+        start = time.process_time_ns()
+        push = self.trace.push
+        for op in self.ring.slice(self.traced, stop - self.traced):
+            push(*op)
+        self.traced = stop
+        self.recording += time.process_time_ns() - start
+
+    def flush(self):
+        # Waits while the main loop has not caught up, which is also how a
+        # paused run stops the child.
+        ring = self.ring
+        while ring.free() < len(self.kinds):
+            self.record()
+            if ring.get(CLOSED):
+                raise SystemExit
+            time.sleep(0.001)
+        self.record()
+        if ring.get(CLOSED):
+            raise SystemExit
+        ring.write(self.kinds, self.first, self.second, self.values)
+        for column in (self.kinds, self.first, self.second, self.values):
+            del column[:]
+
+    def wait(self):
+        """Records the rest of the operations as the main loop reads them."""
+        ring = self.ring
+        self.record()
+        while self.trace is not None and self.traced < ring.get(WRITTEN) and not ring.get(CLOSED):
+            time.sleep(0.001)
+            self.record()
+
+
+def work(memory, capacity, lock, name, values, path):
+    ring = Ring(memory, capacity, lock)
+    file = open(path, "wb") if path is not None else None
+    trace = TraceWriter(file, name, values) if file is not None else None
+    writer = RingWriter(ring, trace)
+    try:
+        # Processor time leaves out waiting for the main loop, and other
+        # processes sharing the core.
+        start = time.process_time_ns()
+        execute(algorithms.lookup(name), TracedArray(values, writer))
+        writer.flush()
+        ring.set(ELAPSED, time.process_time_ns() - start - writer.recording)
+        writer.wait()
+    finally:
+        if file is not None:
+            trace.flush()
+            file.close()
+    ring.set(FINISHED, 1)
+
+
+class ProcessRun:
+    """
+    The same interface as Run, with the algorithm in a child process so it
+    runs on another core than the drawing. The child runs ahead until the
+    ring is full; the operations are passed on to sink, if any, as they are
+    drained. With record, the child also writes the trace of the run, which
+    is in trace once it is closed. Once it is done, seconds is the processor
+    time the algorithm took.
+    """
+
+    def __init__(self, name, values, sink=None, record=False, capacity=1 << 18):
+        self.sink = sink
+        self.path = None
+        self.trace = None
+        self.memory = shared_memory.SharedMemory(create=True, size=Ring.size(capacity))
+        self.memory.buf[:HEADER] = bytes(HEADER)
+        lock = multiprocessing.Lock()
+        self.ring = Ring(self.memory, capacity, lock)
+        if record:
+            descriptor, self.path = tempfile.mkstemp(suffix=".svt")
+            os.close(descriptor)
+        self.process = multiprocessing.Process(target=work,
+            args=(self.memory, capacity, lock, name, list(values), self.path), daemon=True)
+        self.process.start()
+        self.finished = False
+        self.seconds = None
+
+    def drain(self, limit):
+        if self.process is None:
+            return []
+        ops = self.ring.read(limit)
+        if self.sink is not None:
+            push = self.sink.push
+            for op in ops:
+                push(*op)
+        return ops
+
+    def done(self):
+        if self.process is None or self.finished:
+            return True
+        # The child's state is read before the ring, so its last batch can
+        # not be written in between and left behind. A child that died
+        # without finishing leaves nothing more to read.
+        finished = bool(self.ring.get(FINISHED))
+        exited = finished or not self.process.is_alive()
+        if not exited or self.ring.free() < self.ring.capacity:
+            return False
+        self.finished = finished
+        if finished:
+            self.seconds = self.ring.get(ELAPSED) / 1e9
+        return True
+
+    def close(self):
+        if self.process is None:
+            return
+        self.ring.set(CLOSED, 1)
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.process = None
+        self.ring.release()
+        self.memory.close()
+        self.memory.unlink()
+        if self.path is not None:
+            with open(self.path, "rb") as file:
+                self.trace = file.read()
+            os.remove(self.path)
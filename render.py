@@ -0,0 +1,156 @@
+#  ##### BEGIN GPL LICENSE BLOCK #####
+# 
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import numpy
+import pygame
+
+# Modes drawn column by column, which can be built as one image array.
+MODES = ("BARS", "SCATTERPLOT", "BW", "COLOR")
+
+
+def hsv_to_rgb(hue, sat, val):
+    sector = numpy.floor(hue*6).astype(numpy.int64) % 6
+    f = hue*6 - numpy.floor(hue*6)
+    v = numpy.full_like(hue, val)
+    p = numpy.full_like(hue, val*(1-sat))
+    q = val * (1-sat*f)
+    t = val * (1-sat*(1-f))
+    return numpy.stack((
+        numpy.choose(sector, (v, q, p, p, t, v)),
+        numpy.choose(sector, (t, v, v, q, p, p)),
+        numpy.choose(sector, (p, p, t, v, v, q)),
+    ), axis=1)
+
+
+class ColumnRenderer:
+    """
+    Builds the whole element area as one packed (x, y) pixel array and blits
+    it with surfarray, instead of one pygame.draw.rect call per element.
+    """
+
+    def __init__(self, loc, size):
+        self.loc = loc
+        self.size = size
+        self.surface = pygame.Surface(size, 0, 32)
+        self.shifts = self.surface.get_shifts()[:3]
+        self.rows = numpy.arange(size[1])
+        self.columns = numpy.arange(size[0])
+        self.base_colors = numpy.full((size[0], 3), 255, numpy.uint8)
+
+    def pack(self, rgb):
+        rgb = rgb.astype(numpy.uint32)
+        red, green, blue = self.shifts
+        return (rgb[..., 0] << red) | (rgb[..., 1] << green) | (rgb[..., 2] << blue)
+
+    def column_width(self, mode, num_objs, border):
+        return int(self.size[0] / num_objs - (border if mode == "BARS" else 0))
+
+    def column_spans(self, mode, indices, num_objs, border):
+        """Sorted ranges of pixel columns showing the elements at indices, merged where they touch."""
+        width = self.size[0]
+        col_width = self.column_width(mode, num_objs, border)
+        x_loc = self.loc[0]
+        spans = []
+        for i in sorted(indices):
+            if col_width > 0:
+                start = int(width * i / num_objs + x_loc) - x_loc
+                stop = start + col_width
+            else:
+                start = -(-i*width // num_objs)
+                stop = -(-(i+1)*width // num_objs)
+            if start >= stop:
+                continue
+            if spans and start <= spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], stop)
+            else:
+                spans.append([start, stop])
+        return [tuple(span) for span in spans]
+
+    def draw(self, window, mode, objs, highlights, role_colors, border, start=0, stop=None):
+        """Draws the pixel columns from start to stop, by default all of them."""
+        width, height = self.size
+        x_loc, y_loc = self.loc
+        if stop is None:
+            stop = width
+        num_objs = len(objs)
+        columns = self.columns[start:stop]
+        rows = self.rows[None, :]
+
+        # Element shown in each pixel column, with the columns pygame.draw.rect
+        # gives it: from its truncated start for its truncated width, which
+        # leaves some columns empty. With more elements than columns, each
+        # column shows the first element in it.
+        col_width = self.column_width(mode, num_objs, border)
+        if col_width > 0:
+            starts = (width * numpy.arange(num_objs) / num_objs + x_loc).astype(numpy.int64) - x_loc
+            indices = numpy.searchsorted(starts, columns, "right") - 1
+            offsets = columns - starts[indices]
+            covered = offsets < col_width
+            ends = col_width - 1 - offsets
+        else:
+            indices = columns * num_objs // width
+            covered = numpy.ones(len(columns), bool)
+            offsets = columns + (indices*width // -num_objs)
+            ends = -((indices+1)*width // -num_objs) - 1 - columns
+
+        values = numpy.frombuffer(objs, numpy.float64)[indices]
+        col_colors = self.base_colors[start:stop].copy()
+        marked = numpy.zeros(len(columns), bool)
+        # The first region an element is in gives its role, as in Highlights.role.
+        for first, last, role in reversed(highlights.regions):
+            region = (indices >= first) & (indices < last)
+            col_colors[region] = role_colors[role]
+            marked |= region
+        for i, role in highlights.marks.items():
+            columns_of = indices == i
+            col_colors[columns_of] = role_colors[role]
+            marked |= columns_of
+        packed = self.pack(col_colors)
+
+        if mode in ("BARS", "SCATTERPLOT"):
+            # Shorter areas keep the proportions of the full 550 pixels.
+            top = ((y_loc+height) - (500*values+50) * (height/550)).astype(numpy.int64)[:, None] - y_loc
+            if mode == "BARS":
+                mask = rows >= top
+            else:
+                mask = (rows >= top) & (rows < top+5)
+            image = numpy.where(mask & covered[:, None], packed[:, None], numpy.uint32(0))
+
+        else:
+            if mode == "BW":
+                base = numpy.repeat((255*values).astype(numpy.uint8)[:, None], 3, axis=1)
+            else:
+                base = (255 * hsv_to_rgb(values, 0.8, 0.8)).astype(numpy.uint8)
+            base = numpy.where(covered, self.pack(base), numpy.uint32(0))
+            image = numpy.repeat(base[:, None], height, axis=1)
+
+            marked &= covered
+            if marked.any():
+                outline = border + 1
+                edge = marked & ((offsets < outline) | (ends < outline))
+                image[edge] = packed[edge][:, None]
+                image[marked, :outline] = packed[marked][:, None]
+                image[marked, -outline:] = packed[marked][:, None]
+
+        if start == 0 and stop == width:
+            pygame.surfarray.blit_array(self.surface, image)
+        else:
+            pixels = pygame.surfarray.pixels2d(self.surface)
+            pixels[start:stop] = image
+            del pixels
+        window.blit(self.surface, (x_loc+start, y_loc), (start, 0, stop-start, height))
+        return (x_loc+start, y_loc, stop-start, height)
@@ -0,0 +1,129 @@
+#  ##### BEGIN GPL LICENSE BLOCK #####
+# 
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import random
+from array import array
+import pytest
+import algorithms
+import bench
+import timeline
+from operations import SWAP, WRITE, ALLOC, CHOOSE_PIVOT, POP_RANGE, HELD, OpCounter, TracedArray, execute
+from operations import follow_pivots, reserve
+from timeline import Timeline
+
+NAMES = [name for label, name in algorithms.CHOICES]
+INPUTS = {
+    "random": lambda n: bench.gen_input(n, 5),
+    "duplicates": lambda n: [random.Random(5).randrange(4) / 4 for _ in range(n)],
+    "sorted": lambda n: sorted(bench.gen_input(n, 5)),
+    "reversed": lambda n: sorted(bench.gen_input(n, 5), reverse=True),
+}
+
+
+class Recorder:
+    def __init__(self):
+        self.ops = []
+
+    def push(self, kind, i, j=HELD, value=0.0):
+        self.ops.append((kind, i, j, value))
+
+
+def run(name, values):
+    recorder = Recorder()
+    traced = TracedArray(values, recorder)
+    execute(algorithms.lookup(name), traced)
+    return traced.values, recorder.ops
+
+
+@pytest.mark.parametrize("name", NAMES)
+@pytest.mark.parametrize("kind", INPUTS)
+def test_sorts(name, kind):
+    values = INPUTS[kind](100)
+    result, ops = run(name, values)
+    assert result == sorted(values)
+    # The operations alone sort the elements too, as the visualizer plays them.
+    line = Timeline(values)
+    line.extend(ops)
+    assert line.tail[:len(values)].tolist() == sorted(values)
+
+
+def replay(values, ops, positions):
+    """The cells, counters and pivots after the first pos operations for each of positions, worked out from the start."""
+    cells = array("d", values)
+    counter = OpCounter()
+    pivots = []
+    states = {}
+    for pos in range(len(ops)+1):
+        if pos in positions:
+            states[pos] = (cells[:], vars(counter).copy(), pivots)
+        if pos == len(ops):
+            break
+        kind, i, j, value = ops[pos]
+        counter.push(kind, i, j, value)
+        if kind == SWAP:
+            cells[i], cells[j] = cells[j], cells[i]
+        elif kind == WRITE:
+            cells[i] = value
+        elif kind == ALLOC:
+            reserve(cells, len(values) + counter.aux)
+        if kind == CHOOSE_PIVOT or kind == POP_RANGE or (kind == SWAP and pivots):
+            pivots = follow_pivots(pivots, kind, i, j)
+    return states
+
+
+@pytest.fixture(params=["numpy", "plain"])
+def diffs(request, monkeypatch):
+    if request.param == "plain":
+        monkeypatch.setattr(timeline, "numpy", None)
+    elif timeline.numpy is None:
+        pytest.skip("NumPy is not installed")
+
+
+@pytest.mark.parametrize("name", ["sort_merge_top_down", "sort_merge_bottom_up", "sort_quick_dual_pivot_ninther",
+    "sort_quick_hoare_random", "sort_shell"])
+@pytest.mark.parametrize("limit", [None, 0])
+def test_seek_and_undo(name, limit, diffs):
+    # An interval short enough for most keyframes to only hold the cells
+    # changed since the one before, and with a limit the oldest ones are
+    # dropped.
+    values = bench.gen_input(600, 7)
+    ops = run(name, values)[1]
+    line = Timeline(values, interval=256, limit=limit)
+    line.extend(ops)
+    assert len(line) == len(ops)
+    if limit is not None:
+        assert line.start > 0
+    back = range(max(len(line)-2000, line.start), len(line))
+    positions = set(random.Random(1).sample(range(line.start, len(line)+1), 200))
+    positions.update(back, (line.start, len(line)))
+    states = replay(values, ops, positions)
+
+    for pos in positions:
+        cells, counter, pivots = states[pos]
+        elements = array("d")
+        line.state_at(pos, elements)
+        assert elements[:len(cells)] == cells
+        assert vars(line.stats_at(pos)) == counter
+        assert line.pivots_at(pos) == pivots
+
+    # Stepping back from the end undoes one operation at a time.
+    elements = array("d")
+    line.state_at(len(line), elements)
+    for pos in reversed(back):
+        line.undo(pos, elements)
+        cells = states[pos][0]
+        assert elements[:len(cells)] == cells
@@ -0,0 +1,98 @@
+#  ##### BEGIN GPL LICENSE BLOCK #####
+# 
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import io
+import pytest
+import algorithms
+import bench
+import tracefile
+from operations import COMPARE, WRITE, HELD, TracedArray, execute
+from tracefile import Playback, TraceError, TraceReader, TraceWriter
+
+
+class Recorder:
+    def __init__(self):
+        self.ops = []
+
+    def push(self, kind, i, j=HELD, value=0.0):
+        self.ops.append((kind, i, j, value))
+
+
+def run(name, values):
+    recorder = Recorder()
+    execute(algorithms.lookup(name), TracedArray(values, recorder))
+    return recorder.ops
+
+
+def write(name, values, ops):
+    file = io.BytesIO()
+    writer = TraceWriter(file, name, values)
+    for op in ops:
+        writer.push(*op)
+    writer.flush()
+    return file.getvalue()
+
+
+@pytest.mark.parametrize("name", [name for label, name in algorithms.CHOICES])
+def test_round_trip(name):
+    values = bench.gen_input(100, 3)
+    ops = run(name, values)
+    trace = TraceReader(write(name, values, ops))
+    assert trace.name == name
+    assert trace.values == values
+    assert list(trace.ops()) == ops
+
+
+def test_values_not_in_input():
+    values = [0.25, 0.5, 0.75]
+    ops = [(COMPARE, 1, HELD, 0.5), (COMPARE, 2, HELD, 0.3), (WRITE, 0, HELD, 0.75), (WRITE, 2, HELD, -1.5)]
+    assert list(TraceReader(write("sort_insertion", values, ops)).ops()) == ops
+
+
+def test_version_2(monkeypatch):
+    # Written with the flags one bit lower, as before CHOOSE_PIVOT.
+    values = bench.gen_input(60, 1)
+    ops = run("sort_merge_top_down", values)
+    monkeypatch.setattr(tracefile, "FORMAT_VERSION", 2)
+    monkeypatch.setattr(tracefile, "FLAG_HELD", 8)
+    monkeypatch.setattr(tracefile, "FLAG_RAW", 16)
+    data = write("sort_merge_top_down", values, ops)
+    monkeypatch.undo()
+    trace = TraceReader(data)
+    assert trace.version == 2
+    assert list(trace.ops()) == ops
+
+
+def test_cut_off():
+    values = bench.gen_input(40, 2)
+    ops = run("sort_quick_hoare_median3", values)
+    data = write("sort_quick_hoare_median3", values, ops)
+    start = TraceReader(data).start
+    for end in range(start):
+        with pytest.raises(TraceError):
+            TraceReader(data[:end])
+    # Cut off among the operations, the ones before still play.
+    for end in range(start, len(data), 7):
+        played = Playback(TraceReader(data[:end])).drain(len(ops))
+        assert played == ops[:len(played)]
+
+
+def test_not_utf8():
+    data = bytearray(write("sort_insertion", [0.5], []))
+    data[6] = 0xff
+    with pytest.raises(TraceError):
+        TraceReader(bytes(data))
@@ -0,0 +1,220 @@
+#  ##### BEGIN GPL LICENSE BLOCK #####
+# 
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import copy
+import math
+from array import array
+from operations import SWAP, WRITE, ALLOC, POP_RANGE, CHOOSE_PIVOT, HELD, OpCounter, follow_pivots, reserve
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Operations kept at most, about 25 bytes each besides the snapshots.
+LIMIT = 1 << 22
+
+
+def apply_diff(cells, indices, values):
+    """Sets the cells at indices to values."""
+    if numpy is not None and len(indices) > 64:
+        # Scattered in one call through views of the arrays, dropped right
+        # away so cells can still grow.
+        view = numpy.frombuffer(cells, numpy.float64)
+        view[numpy.frombuffer(indices, numpy.int32)] = numpy.frombuffer(values, numpy.float64)
+        del view
+    else:
+        for i, value in zip(indices, values):
+            cells[i] = value
+
+
+class Timeline:
+    """
+    Every operation of a run, with a keyframe of the elements, the counters
+    and the pivots every `interval` operations. Only about every
+    `num_elements` operations a keyframe holds a copy of all the elements,
+    the ones in between only the cells changed since the keyframe before,
+    so keyframes stay dense for many elements without a copy of them each.
+    Seeking starts from the nearest copy at or before the position, applies
+    the changes up to the nearest keyframe and at most `interval` operations;
+    stepping back undoes one operation. Keyframes hold the auxiliary buffer
+    after the elements, cells beyond its current size keep whatever they
+    held last.
+
+    Once `limit` operations are kept, the oldest half of them is dropped with
+    their keyframes, so a long run only keeps its recent past. Positions
+    still count from the start of the run; `start` is the earliest one that
+    can be reached. With a limit of None every operation is kept.
+    """
+
+    def __init__(self, values, interval=4096, limit=LIMIT):
+        self.num_elements = len(values)
+        self.interval = interval
+        # Keyframes from one copy of every element to the next.
+        self.copy_every = max(math.ceil(len(values) / interval), 1)
+        self.limit = None if limit is None else max(limit, 2*interval*self.copy_every)
+        self.start = 0
+        self.kinds = array("b")
+        self.first = array("i")
+        self.second = array("i")
+        self.values = array("d")
+        # Value overwritten by each WRITE, so it can be undone.
+        self.old = array("d")
+
+        self.tail = array("d", values)
+        self.counter = OpCounter()
+        self.pivots = []
+        self.keyframes = [array("d", values)]
+        self.keyframe_stats = [OpCounter()]
+        self.keyframe_pivots = [[]]
+
+    def __len__(self):
+        return self.start + len(self.kinds)
+
+    def push(self, kind, i, j=HELD, value=0.0):
+        tail = self.tail
+        counter = self.counter
+        counter.push(kind, i, j, value)
+        old = 0.0
+        if kind == SWAP:
+            tail[i], tail[j] = tail[j], tail[i]
+            if self.pivots:
+                self.pivots = follow_pivots(self.pivots, kind, i, j)
+        elif kind == WRITE:
+            old = tail[i]
+            tail[i] = value
+        elif kind == ALLOC:
+            reserve(tail, self.num_elements + counter.aux)
+        elif kind == CHOOSE_PIVOT or kind == POP_RANGE:
+            self.pivots = follow_pivots(self.pivots, kind, i, j)
+
+        self.kinds.append(kind)
+        self.first.append(i)
+        self.second.append(j)
+        self.values.append(value)
+        self.old.append(old)
+
+        if len(self.kinds) % self.interval == 0:
+            self.add_keyframe()
+            if self.limit is not None and len(self.kinds) >= self.limit:
+                self.drop(self.limit // 2 // self.interval)
+
+    def add_keyframe(self):
+        tail = self.tail
+        if len(self.keyframes) % self.copy_every == 0:
+            self.keyframes.append(array("d", tail))
+        else:
+            # The cells written or swapped in the interval just ended.
+            start = len(self.kinds) - self.interval
+            changed = set()
+            for kind, i, j in zip(self.kinds[start:], self.first[start:], self.second[start:]):
+                if kind == SWAP:
+                    changed.add(i)
+                    changed.add(j)
+                elif kind == WRITE:
+                    changed.add(i)
+            indices = array("i", sorted(changed))
+            self.keyframes.append((indices, array("d", (tail[i] for i in indices))))
+        self.keyframe_stats.append(copy.copy(self.counter))
+        self.keyframe_pivots.append(self.pivots)
+
+    def drop(self, keys):
+        # Whole runs of keyframes are dropped, so the oldest operation kept
+        # still starts at a copy of every element.
+        keys -= keys % self.copy_every
+        count = keys * self.interval
+        for column in (self.kinds, self.first, self.second, self.values, self.old):
+            del column[:count]
+        del self.keyframes[:keys]
+        del self.keyframe_stats[:keys]
+        del self.keyframe_pivots[:keys]
+        self.start += count
+
+    def restart_at(self, pos, cells, counter):
+        """Drops every operation kept and goes on from pos, with the cells and counters there."""
+        for column in (self.kinds, self.first, self.second, self.values, self.old):
+            del column[:]
+        self.start = pos
+        self.tail = array("d", cells)
+        self.counter = copy.copy(counter)
+        self.pivots = []
+        self.keyframes = [array("d", cells)]
+        self.keyframe_stats = [copy.copy(counter)]
+        self.keyframe_pivots = [[]]
+
+    def room(self, pos):
+        """How many more operations can be added before pos would be dropped."""
+        if self.limit is None:
+            return math.inf
+        return pos + self.limit//2 - len(self)
+
+    def extend(self, ops):
+        for op in ops:
+            self.push(*op)
+
+    def op(self, pos):
+        pos -= self.start
+        return self.kinds[pos], self.first[pos], self.second[pos], self.values[pos]
+
+    def ops(self, start, stop):
+        start -= self.start
+        stop -= self.start
+        return list(zip(self.kinds[start:stop], self.first[start:stop], self.second[start:stop], self.values[start:stop]))
+
+    def keyframe(self, pos):
+        # Index of the last keyframe at or before pos.
+        return (pos - self.start) // self.interval
+
+    def state_at(self, pos, elements):
+        """Overwrites elements with their values after the first pos operations."""
+        key = self.keyframe(pos)
+        base = key - key % self.copy_every
+        elements[:] = self.keyframes[base]
+        reserve(elements, self.num_elements + self.counter.peak_aux)
+        for indices, values in self.keyframes[base+1:key+1]:
+            apply_diff(elements, indices, values)
+        for kind, i, j, value in self.ops(self.start + key*self.interval, pos):
+            if kind == SWAP:
+                elements[i], elements[j] = elements[j], elements[i]
+            elif kind == WRITE:
+                elements[i] = value
+
+    def undo(self, pos, elements):
+        """Turns elements after pos+1 operations into elements after pos."""
+        pos -= self.start
+        kind, i, j = self.kinds[pos], self.first[pos], self.second[pos]
+        if kind == SWAP:
+            elements[i], elements[j] = elements[j], elements[i]
+        elif kind == WRITE:
+            elements[i] = self.old[pos]
+
+    def pivots_at(self, pos):
+        """Where the pivots chosen for the range being partitioned are after the first pos operations."""
+        key = self.keyframe(pos)
+        pivots = self.keyframe_pivots[key]
+        for kind, i, j, value in self.ops(self.start + key*self.interval, pos):
+            if kind == CHOOSE_PIVOT or kind == POP_RANGE or (kind == SWAP and pivots):
+                pivots = follow_pivots(pivots, kind, i, j)
+        return pivots
+
+    def stats_at(self, pos):
+        key = self.keyframe(pos)
+        counter = copy.copy(self.keyframe_stats[key])
+        for op in self.ops(self.start + key*self.interval, pos):
+            counter.push(*op)
+        return counter
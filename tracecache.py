@@ -0,0 +1,164 @@
+#  ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import os
+import inspect
+import hashlib
+from array import array
+from collections import OrderedDict
+import algorithms
+import operations
+from operations import OpCounter
+from tracefile import FORMAT_VERSION, read_varint, write_varint, pack_doubles, unpack_doubles
+
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser(os.path.join("~", ".cache"))),
+    "sortingvisualizer", "traces")
+
+
+# Counters stored with a cached run, in order.
+COUNTER_FIELDS = ("ops", "comp", "read", "write", "aux", "peak_aux", "stack", "peak_stack", "depth", "peak_depth")
+
+
+def input_hash(values):
+    return hashlib.sha1(array("d", values).tobytes()).hexdigest()
+
+
+def code_revision():
+    # A trace is only reused by the code that made it: editing an algorithm,
+    # or the operations they are traced as, gives every run a new key.
+    source = "".join(inspect.getsource(module) for module in (algorithms, operations))
+    return f"v{FORMAT_VERSION}-{hashlib.sha1(source.encode()).hexdigest()[:12]}"
+
+
+REVISION = code_revision()
+
+
+def pack_end(cells, counter):
+    """The cells and counters after a whole run, so its end is shown without decoding it."""
+    out = bytearray()
+    write_varint(out, len(cells))
+    out += pack_doubles(cells)
+    for field in COUNTER_FIELDS:
+        write_varint(out, getattr(counter, field))
+    return bytes(out)
+
+
+def unpack_end(data):
+    num_cells, pos = read_varint(data, 0)
+    cells = unpack_doubles(data[pos:pos+8*num_cells])
+    pos += 8*num_cells
+    counter = OpCounter()
+    for field in COUNTER_FIELDS:
+        value, pos = read_varint(data, pos)
+        setattr(counter, field, value)
+    return cells, counter
+
+
+class TraceCache:
+    """
+    Trace files of finished runs by algorithm, input and REVISION, so running
+    the same algorithm on the same input again does not have to compute
+    anything.
+    Next to each trace is its end, packed by pack_end, or None for a trace
+    cached without one. The most recently used runs are kept in memory up to
+    memory_bytes and on disk up to disk_bytes, dropping the least recently
+    used first.
+    """
+
+    def __init__(self, directory=CACHE_DIR, memory_bytes=64 << 20, disk_bytes=512 << 20):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.memory = OrderedDict()
+        self.memory_used = 0
+
+    @staticmethod
+    def key(name, values):
+        return name, REVISION, input_hash(values)
+
+    def path(self, key, suffix=".svt"):
+        return os.path.join(self.directory, "-".join(key) + suffix)
+
+    def get(self, name, values):
+        """Returns the trace and the end of the run, or None."""
+        key = self.key(name, values)
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        try:
+            with open(self.path(key), "rb") as file:
+                data = file.read()
+            os.utime(self.path(key))
+        except OSError:
+            return None
+        try:
+            with open(self.path(key, ".end"), "rb") as file:
+                end = file.read()
+        except OSError:
+            end = None
+        self.remember(key, data, end)
+        return data, end
+
+    def put(self, name, values, data, end):
+        key = self.key(name, values)
+        self.remember(key, data, end)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # The end goes first, so a trace on disk always has its end.
+            for suffix, contents in ((".end", end), (".svt", data)):
+                temp = self.path(key, suffix) + ".part"
+                with open(temp, "wb") as file:
+                    file.write(contents)
+                os.replace(temp, self.path(key, suffix))
+            self.evict_disk()
+        except OSError:
+            pass
+
+    def remember(self, key, data, end):
+        if key in self.memory:
+            self.memory_used -= self.size(*self.memory.pop(key))
+        if self.size(data, end) > self.memory_bytes:
+            return
+        self.memory[key] = (data, end)
+        self.memory_used += self.size(data, end)
+        while self.memory_used > self.memory_bytes:
+            key, entry = self.memory.popitem(last=False)
+            self.memory_used -= self.size(*entry)
+
+    @staticmethod
+    def size(data, end):
+        return len(data) + (len(end) if end is not None else 0)
+
+    def evict_disk(self):
+        # A trace and its end are counted and removed together.
+        files = {}
+        for entry in os.scandir(self.directory):
+            stem, suffix = os.path.splitext(entry.path)
+            if suffix in (".svt", ".end"):
+                stat = entry.stat()
+                mtime, size = files.get(stem, (0, 0))
+                files[stem] = (max(mtime, stat.st_mtime) if suffix == ".svt" else mtime, size + stat.st_size)
+        used = sum(size for mtime, size in files.values())
+        for mtime, size, stem in sorted((mtime, size, stem) for stem, (mtime, size) in files.items()):
+            if used <= self.disk_bytes:
+                break
+            for suffix in (".svt", ".end"):
+                try:
+                    os.remove(stem + suffix)
+                except FileNotFoundError:
+                    pass
+            used -= size
@@ -0,0 +1,291 @@
+#  ##### BEGIN GPL LICENSE BLOCK #####
+# 
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import sys
+import struct
+import argparse
+import itertools
+from array import array
+from operations import COMPARE, SWAP, WRITE, ALLOC, FREE, PUSH_RANGE, POP_RANGE, CHOOSE_PIVOT, HELD
+
+# File layout:
+#   magic, format version
+#   varint length + utf-8 algorithm name
+#   varint element count + the input as little endian doubles
+#   operations until the end of the file
+#
+# Each operation starts with a byte holding the kind in the low four bits,
+# FLAG_HELD when a COMPARE is against a held value and FLAG_RAW when its
+# value is not one of the input values. ALLOC and FREE follow with their
+# cell count as a varint, PUSH_RANGE and POP_RANGE with the depth of the
+# range. Every other kind follows with the first index as a zigzag varint
+# delta from the previous first index, then for SWAP, CHOOSE_PIVOT and
+# COMPARE the second index as a zigzag varint delta from the first, and for
+# WRITE and held COMPARE the value as a varint rank into the sorted input,
+# or as a raw double with FLAG_RAW.
+#
+# Version 1, from before the auxiliary buffer, kept the kind in the low two
+# bits and version 2, from before CHOOSE_PIVOT, in the low three, with the
+# flags right above; both are still read.
+
+MAGIC = b"SVTR"
+FORMAT_VERSION = 3
+FLAG_HELD = 16
+FLAG_RAW = 32
+# Kind mask, FLAG_HELD and FLAG_RAW by format version.
+HEADER_BITS = {1: (3, 4, 8), 2: (7, 8, 16), 3: (15, FLAG_HELD, FLAG_RAW)}
+# Kinds stored as only a varint, without indices or a value.
+COUNTS = (ALLOC, FREE, PUSH_RANGE, POP_RANGE)
+DOUBLE = struct.Struct("<d")
+
+
+def write_varint(out, num):
+    while num >= 0x80:
+        out.append((num & 0x7F) | 0x80)
+        num >>= 7
+    out.append(num)
+
+
+def read_varint(data, pos):
+    num = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        num |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return num, pos
+        shift += 7
+
+
+def zigzag(num):
+    return num*2 if num >= 0 else -num*2 - 1
+
+
+def unzigzag(num):
+    return num >> 1 if not num & 1 else -(num >> 1) - 1
+
+
+def pack_doubles(values):
+    packed = array("d", values)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_doubles(data):
+    values = array("d")
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tolist()
+
+
+class TraceError(Exception):
+    pass
+
+
+class TraceWriter:
+    """Operation sink that streams a run into an open binary file."""
+
+    flush_size = 1 << 16
+
+    def __init__(self, file, name, values):
+        self.file = file
+        self.ranks = {value: i for i, value in enumerate(sorted(values))}
+        self.last = 0
+        self.out = bytearray(MAGIC)
+        self.out.append(FORMAT_VERSION)
+        encoded = name.encode()
+        write_varint(self.out, len(encoded))
+        self.out += encoded
+        write_varint(self.out, len(values))
+        self.out += pack_doubles(values)
+
+    def push(self, kind, i, j=HELD, value=0.0):
+        out = self.out
+        if kind in COUNTS:
+            out.append(kind)
+            write_varint(out, i)
+            return
+        has_value = kind == WRITE or (kind == COMPARE and j == HELD)
+        rank = self.ranks.get(value) if has_value else None
+        header = kind
+        if kind == COMPARE and j == HELD:
+            header |= FLAG_HELD
+        if has_value and rank is None:
+            header |= FLAG_RAW
+        out.append(header)
+
+        write_varint(out, zigzag(i - self.last))
+        self.last = i
+        if kind == SWAP or kind == CHOOSE_PIVOT or (kind == COMPARE and j != HELD):
+            write_varint(out, zigzag(j - i))
+        elif has_value:
+            if rank is None:
+                out += DOUBLE.pack(value)
+            else:
+                write_varint(out, rank)
+
+        if len(out) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.out)
+        self.out = bytearray()
+        self.file.flush()
+
+
+class TraceReader:
+    def __init__(self, data):
+        # Anything wrong before the operations is a TraceError, so a file
+        # that can not be played is never half loaded.
+        if len(data) < 5 or data[:4] != MAGIC:
+            raise TraceError("not a trace file")
+        if data[4] not in HEADER_BITS:
+            raise TraceError(f"unsupported trace format version {data[4]}")
+        self.version = data[4]
+
+        try:
+            length, pos = read_varint(data, 5)
+            if pos + length > len(data):
+                raise TraceError("trace file cut off in the algorithm name")
+            self.name = data[pos:pos+length].decode()
+            num_values, pos = read_varint(data, pos+length)
+        except IndexError:
+            raise TraceError("trace file cut off in its header") from None
+        except UnicodeDecodeError:
+            raise TraceError("algorithm name is not UTF-8") from None
+        if pos + 8*num_values > len(data):
+            raise TraceError("trace file cut off in its input")
+        self.values = unpack_doubles(data[pos:pos+8*num_values])
+        self.data = data
+        self.start = pos + 8*num_values
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            return cls(file.read())
+
+    def ops(self):
+        data = self.data
+        by_rank = sorted(self.values)
+        end = len(data)
+        kind_mask, flag_held, flag_raw = HEADER_BITS[self.version]
+        pos = self.start
+        last = 0
+        try:
+            while pos < end:
+                header = data[pos]
+                kind = header & kind_mask
+                if kind in COUNTS:
+                    count, pos = read_varint(data, pos+1)
+                    yield kind, count, HELD, 0.0
+                    continue
+                delta, pos = read_varint(data, pos+1)
+                i = last + unzigzag(delta)
+                last = i
+                j = HELD
+                value = 0.0
+
+                if kind == SWAP or kind == CHOOSE_PIVOT or (kind == COMPARE and not header & flag_held):
+                    delta, pos = read_varint(data, pos)
+                    j = i + unzigzag(delta)
+                elif kind == WRITE or kind == COMPARE:
+                    if header & flag_raw:
+                        value = DOUBLE.unpack_from(data, pos)[0]
+                        pos += 8
+                    else:
+                        rank, pos = read_varint(data, pos)
+                        value = by_rank[rank]
+
+                yield kind, i, j, value
+        except (IndexError, struct.error):
+            raise TraceError(f"trace file cut off or damaged at byte {pos}") from None
+
+
+class Playback:
+    """
+    The same interface as Run for a recorded run, decoding its operations
+    only as they are drained, so even a long trace starts playing right
+    away. A trace that is cut off plays as far as it goes.
+    """
+
+    def __init__(self, trace):
+        self.ops = trace.ops()
+        self.finished = False
+
+    def drain(self, limit):
+        ops = []
+        try:
+            ops.extend(itertools.islice(self.ops, limit))
+        except TraceError:
+            self.ops = iter(())
+        if len(ops) < limit:
+            self.finished = True
+        return ops
+
+    def done(self):
+        return self.finished
+
+    def close(self):
+        self.ops = iter(())
+        self.finished = True
+
+
+def record(path, name, values):
+    import algorithms
+    from operations import TracedArray, execute
+
+    with open(path, "wb") as file:
+        writer = TraceWriter(file, name, values)
+        execute(algorithms.lookup(name), TracedArray(values, writer))
+        writer.flush()
+
+
+def main(argv=None):
+    import bench
+
+    parser = argparse.ArgumentParser(description="Record sorting runs to trace files and inspect them.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    parser_record = commands.add_parser("record", help="record a run without the visualizer")
+    parser_record.add_argument("algorithm", choices=bench.algorithm_names())
+    parser_record.add_argument("size", type=int)
+    parser_record.add_argument("output")
+    parser_record.add_argument("-s", "--seed", type=int, default=0, help="seed for the shuffled input")
+    parser_info = commands.add_parser("info", help="summarize a trace file")
+    parser_info.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        record(args.output, "sort_" + args.algorithm, bench.gen_input(args.size, args.seed))
+    else:
+        from operations import OpCounter
+        counter = OpCounter()
+        try:
+            trace = TraceReader.load(args.path)
+            for op in trace.ops():
+                counter.push(*op)
+        except (OSError, TraceError) as e:
+            parser.error(f"cannot read {args.path}: {e}")
+        print(f"{trace.name}: {len(trace.values)} elements, {counter.ops} ops, {len(trace.data)} bytes")
+        print(f"comparisons {counter.comp}, reads {counter.read}, writes {counter.write}, "
+            f"peak auxiliary cells {counter.peak_aux}, peak stack {counter.peak_stack}, peak depth {counter.peak_depth}")
+
+
+if __name__ == "__main__":
+    main()
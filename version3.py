@@ -18,17 +18,44 @@
 import os
 import math
 import time
-import threading
+import copy
 import colorsys
-import random
+import functools
+from array import array
+import tempfile
 import pygame
+import algorithms
+import bench
+import costmodel
+from operations import SWAP, WRITE, POP_RANGE, CHOOSE_PIVOT, CURRENT, COMPARED, WRITTEN, PIVOT, SORTED
+from operations import Elements, Highlights, OpCounter, Pacer, RateMeter, Run, reserve
+from tracefile import Playback, TraceError, TraceReader, TraceWriter
+from timeline import Timeline
+from tracecache import TraceCache, pack_end, unpack_end
+from processrun import ProcessRun
 from tkinter import Tk
-from tkinter.filedialog import askopenfilename
+from tkinter.filedialog import askopenfilename, asksaveasfilename
+try:
+    import render
+except ImportError:
+    render = None
 pygame.init()
-Tk().withdraw()
 
-SCREEN = (1600, 900)
+SCREEN = (1600, 960)
 FPS = 60
+# Part of each frame spent running the algorithm and applying its operations,
+# the rest is for drawing.
+OPS_BUDGET = 0.5 / FPS
+OPS_CHUNK = 4096
+
+# Everything above ELEMENTS_RECT is controls, everything in it is elements,
+# and AUX_RECT under it shows the auxiliary buffer of the algorithm.
+CONTROLS_RECT = (0, 0, 1600, 295)
+ELEMENTS_RECT = (0, 295, 1600, 605)
+AUX_RECT = (0, 900, 1600, 60)
+# A race splits ELEMENTS_RECT into one pane per algorithm, each at least
+# 75 pixels high.
+MAX_RACERS = 8
 
 FONT_SMALL = pygame.font.SysFont("arial", 12)
 FONT_MED = pygame.font.SysFont("arial", 16)
@@ -43,11 +70,28 @@ RED = (255, 150, 150)
 GREEN = (150, 255, 150)
 BLUE = (150, 150, 255)
 
+YELLOW = (255, 230, 120)
+
+ROLE_COLORS = {
+    CURRENT: RED,
+    COMPARED: GREEN,
+    WRITTEN: RED,
+    PIVOT: YELLOW,
+    SORTED: BLUE,
+}
+
 CHOICE_LIGHT = (255, 220, 150)
 CHOICE_DARK = (200, 170, 120)
 CHOICE_SELECT = (190, 230, 180)
 
 
+# Most labels are the same from frame to frame, so rendered text is kept
+# by font, string and color.
+@functools.lru_cache(maxsize=256)
+def render_text(font, text, color):
+    return font.render(text, 1, color)
+
+
 class Button:
     def __init__(self, loc, size, text):
         self.loc = loc
@@ -77,7 +121,7 @@ class Button:
 
 
 class Slider:
-    def __init__(self, loc, size, circle_size, font, label, default_val, val_range):
+    def __init__(self, loc, size, circle_size, font, label, default_val, val_range, log=False):
         self.loc = loc
         self.size = size
         self.circle_size = circle_size
@@ -86,13 +130,16 @@ class Slider:
         self.value = default_val
         self.range = val_range
         self.val_dist = val_range[1] - val_range[0]
+        self.log = log
         self.dragging = False
+        # Shown after the value.
+        self.note = ""
 
     def draw(self, window, events):
         loc = self.loc
         size = self.size
 
-        text = self.font.render(f"{self.label}: {self.value}", 1, WHITE)
+        text = render_text(self.font, f"{self.label}: {self.value}{self.note}", WHITE)
         text_loc = (loc[0] + (self.size[0]-text.get_width())//2, self.loc[1]+self.size[1]+7)
         pygame.draw.rect(window, GRAY, loc+size)
         pygame.draw.rect(window, WHITE, loc+size, 1)
@@ -114,154 +161,545 @@ class Slider:
 
     def loc_to_value(self, loc):
         fac = max(min((loc-self.loc[0]) / self.size[0], 1), 0)
+        if self.log:
+            return int(round(self.range[0] * (self.range[1]/self.range[0]) ** fac))
         return int(fac*self.val_dist + self.range[0])
 
     def value_to_loc(self):
-        fac = (self.value-self.range[0]) / self.val_dist
+        if self.log:
+            fac = math.log(self.value/self.range[0]) / math.log(self.range[1]/self.range[0])
+        else:
+            fac = (self.value-self.range[0]) / self.val_dist
         return fac * self.size[0] + self.loc[0]
 
 
+class ChoiceList:
+    scroll_speed = 10
+    choice_width = 30
+    choices = ()
+
+    def __init__(self, loc, size, font):
+        self.loc = loc
+        self.size = size
+        self.font = font
+        self.offset = 0
+        self.sel_ind = 0
+        self.surface = None
+        self.drawn_as = None
+
+    def draw_list(self, window, events):
+        loc = self.loc
+        size = self.size
+        if self.drawn_as != (self.offset, self.selection()):
+            self.surface = pygame.Surface(self.size)
+            for i, choice in enumerate(self.choices):
+                y_loc = self.choice_width*i + self.offset
+                color = CHOICE_LIGHT if i%2 == 0 else CHOICE_DARK
+                if self.selected(i):
+                    color = CHOICE_SELECT
+
+                pygame.draw.rect(self.surface, color, (0, y_loc, size[0], self.choice_width))
+                text = render_text(self.font, choice[0], BLACK)
+                text_loc = ((size[0]-text.get_width()) // 2, y_loc + (self.choice_width-text.get_height())//2)
+                self.surface.blit(text, text_loc)
+            self.drawn_as = (self.offset, self.selection())
+
+        window.blit(self.surface, self.loc)
+        pygame.draw.rect(window, WHITE, self.loc+self.size, 2)
+
+        mouse_pos = pygame.mouse.get_pos()
+        if loc[0] <= mouse_pos[0] <= loc[0]+size[0] and loc[1] <= mouse_pos[1] <= loc[1]+size[1]:
+            for event in events:
+                if event.type == pygame.MOUSEBUTTONDOWN:
+                    if event.button == 1:
+                        index = (mouse_pos[1]-loc[1]-self.offset) // self.choice_width
+                        if 0 <= index < len(self.choices):
+                            self.select(index)
+
+                    elif event.button == 4:
+                        self.offset += self.scroll_speed
+                    elif event.button == 5:
+                        self.offset -= self.scroll_speed
+
+        self.offset = min(self.offset, 0)
+        self.offset = max(self.offset, size[1] - len(self.choices)*self.choice_width)
+
+    def select(self, index):
+        self.sel_ind = index
+
+    def selected(self, i):
+        return i == self.sel_ind
+
+    def selection(self):
+        # Anything the highlighted choices depend on, to know when to repaint.
+        return self.sel_ind
+
+
+class InputList(ChoiceList):
+    choices = tuple(choice for choice in (
+        ("Shuffled", "shuffled"),
+        ("Reversed", "reversed"),
+        ("Nearly Sorted", "nearly_sorted"),
+        ("Few Unique", "few_unique"),
+        ("Sawtooth", "sawtooth"),
+        ("Organ Pipe", "organ_pipe"),
+        ("Gaussian", "gaussian"),
+        ("Runs", "runs"),
+    ) if choice[1] in bench.DISTRIBUTIONS)
+
+
 class Objects:
-    slider_num_objs = Slider((1350, 50), (225, 10), 7, FONT_SMALL, "Amount", 50, (10, 512))
+    max_objs = 131072 if render is not None else 512
+    slider_num_objs = Slider((1350, 50), (225, 10), 7, FONT_SMALL, "Amount", 50, (10, max_objs), log=True)
     button_gen_objs = Button((1400, 100), (125, 40), FONT_MED.render("Generate", 1, BLACK))
     button_random = Button((1400, 150), (125, 40), FONT_MED.render("Randomize", 1, BLACK))
-    slider_speed = Slider((1350, 210), (225, 10), 7, FONT_SMALL, "Speed", 30, (10, 240))
+    inputs = InputList((370, 50), (150, 140), FONT_MED)
+    slider_seed = Slider((370, 210), (150, 10), 7, FONT_SMALL, "Seed", 0, (0, 999))
+    slider_speed = Slider((1350, 210), (225, 10), 7, FONT_SMALL, "Ops/sec", 30, (1, 4000000), log=True)
+
+    button_full = Button((1400, 250), (125, 40), FONT_MED.render("Redraw: All", 1, BLACK))
+    button_incremental = Button((1400, 250), (125, 40), FONT_MED.render("Redraw: Changes", 1, BLACK))
 
     def __init__(self, num_objs):
-        self.reset_stats()
+        # Set by the main loop before it starts, so the export workers
+        # drawing the elements never load it; Est. Time is shown once set.
+        self.costs = None
         self.gen_objs(num_objs)
+        self.seed = None
+        self.renderer = render.ColumnRenderer((50, 350), (1500, 550)) if render is not None else None
+        self.incremental = False
+        self.drawn_as = None
+        self.scratch = None
+        self.aux_drawn = 0
+        self.strips_key = None
+        self.strips = []
 
     def gen_objs(self, num_objs):
-        self.objs = []
-        self.colors = []
-        for i in range(num_objs):
-            self.objs.append(i / num_objs)
-            self.colors.append(WHITE)
-
-    def set_objs(self, objs):
-        self.objs = objs[:]
-
-    def shuffle(self):
-        random.shuffle(self.objs)
-
-    def reset_stats(self):
-        self.stats_comp = 0
-        self.stats_read = 0
-        self.stats_write = 0
-
-    def draw(self, window, events, mode, sorter, image):
+        self.load(i / num_objs for i in range(num_objs))
+
+    def load(self, values):
+        self.objs = Elements(values)
+        self.ranks = {obj: i for i, obj in enumerate(sorted(self.objs.copy()))}
+        self.lookup_key = None
+        self.highlights = Highlights()
+        self.reset_timeline()
+
+    def randomize(self, num_objs, distribution, seed):
+        self.load(bench.DISTRIBUTIONS[distribution](num_objs, seed))
+        self.seed = seed
+
+    def reset_timeline(self):
+        # Every run is recorded from the elements as they are now, so it can
+        # be stepped through and scrubbed while and after it plays.
+        self.timeline = Timeline(self.objs.copy())
+        self.position = 0
+        self.stats = OpCounter()
+        self.highlights.reset()
+        self.redraw()
+
+    def redraw(self):
+        self.dirty = set()
+        self.drawn_as = None
+
+    def consume(self, buffer, limit):
+        # Operations already in the timeline (after seeking back) are played
+        # first, the rest is taken from the running algorithm.
+        timeline = self.timeline
+        stop = self.position + limit
+        if buffer is not None and stop > len(timeline):
+            timeline.extend(buffer.drain(stop - len(timeline)))
+        ops = timeline.ops(self.position, stop)
+        if not ops:
+            return 0
+        self.position += len(ops)
+
+        objs = self.objs.cells
+        # The timeline has counted every operation it holds, so its peak
+        # covers every ALLOC among them.
+        reserve(objs, len(self.objs) + timeline.counter.peak_aux)
+        dirty = self.dirty
+        highlights = self.highlights
+        for kind, i, j, value in ops:
+            if kind == SWAP:
+                objs[i], objs[j] = objs[j], objs[i]
+                dirty.add(i)
+                dirty.add(j)
+                if highlights.pivots:
+                    highlights.follow(kind, i, j)
+            elif kind == WRITE:
+                objs[i] = value
+                dirty.add(i)
+            elif kind == CHOOSE_PIVOT or kind == POP_RANGE:
+                highlights.follow(kind, i, j)
+        if self.position == len(timeline):
+            self.stats = copy.copy(timeline.counter)
+        else:
+            self.stats = timeline.stats_at(self.position)
+
+        dirty.update(self.highlights.clear())
+        kind, i, j, value = ops[-1]
+        self.highlights.mark_op(kind, i, j)
+        dirty.update(self.highlights.marks)
+        return len(ops)
+
+    def seek(self, position):
+        self.timeline.state_at(position, self.objs.cells)
+        self.position = position
+        self.stats = self.timeline.stats_at(position)
+        self.mark_position()
+        self.redraw()
+
+    def jump(self, position, cells, stats):
+        # The steps before position are forgotten, for the end of a cached
+        # run that has not been decoded up to it.
+        self.timeline.restart_at(position, cells, stats)
+        self.seek(position)
+
+    def step_back(self):
+        if self.position == self.timeline.start:
+            return
+        self.position -= 1
+        kind, i, j, value = self.timeline.op(self.position)
+        self.timeline.undo(self.position, self.objs.cells)
+        self.dirty.update((i, j) if kind == SWAP else (i,))
+        # Only a seek works out the peaks again.
+        self.stats.pop(kind, i, j, value)
+        self.mark_position()
+
+    def mark_position(self):
+        self.dirty.update(self.highlights.clear())
+        if self.highlights.regions:
+            self.highlights.clear_regions()
+            self.redraw()
+        self.highlights.pivots = self.timeline.pivots_at(self.position)
+        if self.position > self.timeline.start:
+            kind, i, j, value = self.timeline.op(self.position-1)
+            self.highlights.mark_op(kind, i, j)
+            self.dirty.update(self.highlights.marks)
+
+    def finish(self):
+        self.highlights.reset()
+        self.highlights.mark_region(0, len(self.objs), SORTED)
+        self.redraw()
+
+    def image_strips(self, image, window):
+        # The scaled image and one strip of it per rank only change with the
+        # image, the element count or the window size.
+        num_objs = len(self.objs)
+        key = (image, num_objs, window.get_size())
+        if self.strips_key != key:
+            total_x_size = int(image.get_width() / image.get_height() * 550)
+            x_size = total_x_size / num_objs + 1
+            scl_img = pygame.transform.scale(image, (total_x_size, 550))
+            self.strips = []
+            for rank in range(num_objs):
+                img_x_pos = int(total_x_size * rank / num_objs)
+                width = min(int(x_size), total_x_size-img_x_pos)
+                self.strips.append(scl_img.subsurface((img_x_pos, 0, width, 550)))
+            self.strips_key = key
+        return self.strips
+
+    def lookup(self, mode, window):
+        # Positions and colors that only depend on the index or on the value
+        # from the generated set, built once per mode, count and window size.
+        num_objs = len(self.objs)
+        key = (mode, num_objs, window.get_size())
+        if self.lookup_key == key:
+            return self.lookup_table
+
+        lut = {}
+        if mode in ("BARS", "SCATTERPLOT", "BW", "COLOR"):
+            lut["x"] = [1500 * i / num_objs + 50 for i in range(num_objs)]
+        if mode in ("PIE", "PIESCATTER", "PIEBW", "PIECOLOR"):
+            angles = [math.pi * 2 / num_objs * i for i in range(num_objs)]
+            lut["unit"] = [(math.cos(angle), math.sin(angle)) for angle in angles]
+            lut["end"] = [(800+cos*300, 600+sin*300) for cos, sin in lut["unit"]]
+        if mode in ("COLOR", "PIECOLOR"):
+            lut["hue"] = {obj: [255*x for x in colorsys.hsv_to_rgb(obj, 0.8, 0.8)] for obj in self.ranks}
+
+        self.lookup_key = key
+        self.lookup_table = lut
+        return lut
+
+    def color_of(self, i):
+        role = self.highlights.role(i)
+        return WHITE if role is None else ROLE_COLORS[role]
+
+    def draw(self, window, events, sorter):
         self.slider_num_objs.draw(window, events)
         self.button_gen_objs.draw(window, events)
         self.button_random.draw(window, events)
+        self.inputs.draw_list(window, events)
+        self.slider_seed.draw(window, events)
         self.slider_speed.draw(window, events)
-        window.blit(FONT_MED.render(f"Accesses: {self.stats_read}", 1, WHITE), (1100, 50))
-        window.blit(FONT_MED.render(f"Comparisons: {self.stats_comp}", 1, WHITE), (1100, 75))
-        window.blit(FONT_MED.render(f"Writes: {self.stats_write}", 1, WHITE), (1100, 100))
-        window.blit(FONT_MED.render(
-            f"Est. Time: {int(0.0167*self.stats_write + 0.0145*self.stats_read + 0.0225*self.stats_comp) / 1000} ms",
-            1, WHITE), (1100, 125))
+        button_redraw = self.button_incremental if self.incremental else self.button_full
+        button_redraw.draw(window, events)
+        stats = self.stats
+        window.blit(render_text(FONT_MED, f"Accesses: {stats.read}", WHITE), (1100, 50))
+        window.blit(render_text(FONT_MED, f"Comparisons: {stats.comp}", WHITE), (1100, 75))
+        window.blit(render_text(FONT_MED, f"Writes: {stats.write}", WHITE), (1100, 100))
+        if self.costs is not None:
+            name = sorter.choices[sorter.sel_ind][1]
+            low, median, high = (1000*x for x in self.costs.estimate(stats, name))
+            window.blit(render_text(FONT_MED, f"Est. Time: {median:.4g} ms", WHITE), (1100, 125))
+            window.blit(render_text(FONT_SMALL, f"Range: {low:.4g} - {high:.4g} ms", GRAY_LIGHT), (1100, 150))
+        window.blit(render_text(FONT_MED, f"Aux Memory: {stats.aux} (peak {stats.peak_aux})", WHITE), (1100, 170))
+        window.blit(render_text(FONT_MED, f"Stack: {stats.stack} (peak {stats.peak_stack})", WHITE), (1100, 195))
+        window.blit(render_text(FONT_MED, f"Depth: {stats.depth} (peak {stats.peak_depth})", WHITE), (1100, 220))
+
+        if button_redraw.clicked(events):
+            self.incremental = not self.incremental
+            self.redraw()
+        if not sorter.active:
+            if self.button_gen_objs.clicked(events) or self.button_random.clicked(events):
+                # New elements replace the panes of a finished race.
+                sorter.race = None
+            if self.button_gen_objs.clicked(events):
+                self.gen_objs(self.slider_num_objs.value)
+            if self.button_random.clicked(events):
+                # Clicking again moves on to the next seed, picking a seed on
+                # the slider makes the same set again.
+                if self.slider_seed.value == self.seed:
+                    self.slider_seed.value = (self.seed+1) % (self.slider_seed.range[1]+1)
+                self.randomize(self.slider_num_objs.value, self.inputs.choices[self.inputs.sel_ind][1],
+                    self.slider_seed.value)
+
+    def draw_changes(self, window, mode, image):
+        num_objs = len(self.objs)
+        # The buffer strip is small enough to draw whole whenever it is in use.
+        rects = []
+        if self.stats.aux or self.aux_drawn:
+            self.draw_aux(window)
+            rects.append(AUX_RECT)
+        self.dirty = {i for i in self.dirty if i < num_objs}
+        if self.drawn_as == (mode, image) and not self.dirty:
+            return rects
+        if self.drawn_as != (mode, image) or len(self.dirty) > num_objs//8:
+            window.fill(BLACK, ELEMENTS_RECT)
+            self.draw_elements(window, mode, image)
+            self.dirty = set()
+            self.drawn_as = (mode, image)
+            return rects + [ELEMENTS_RECT]
+
+        if self.renderer is not None and mode in render.MODES:
+            # The changed columns are drawn by the renderer that drew the rest.
+            objs = self.objs.cells[:num_objs]
+            border = 1 if num_objs < 200 else 0
+            for start, stop in self.renderer.column_spans(mode, self.dirty, num_objs, border):
+                rects.append(self.renderer.draw(window, mode, objs, self.highlights, ROLE_COLORS, border, start, stop))
+            self.dirty = set()
+            return rects
+
+        # Elements are drawn whole onto a scratch surface and only the rects
+        # are copied, since clipping a line moves the pixels it is drawn with.
+        # Every element that may reach a rect is drawn, in order, so drawing
+        # them all once after clearing every rect gives each rect right.
+        if self.scratch is None:
+            self.scratch = pygame.Surface(SCREEN)
+        regions = self.dirty_regions(mode, image)
+        for rect in regions:
+            self.scratch.fill(BLACK, rect)
+        self.draw_elements(self.scratch, mode, image, sorted(set().union(*regions.values())))
+        for rect in regions:
+            rect = pygame.Rect(rect).clip(ELEMENTS_RECT)
+            window.blit(self.scratch, rect, rect)
+            rects.append(rect)
+        self.dirty = set()
+        return rects
+
+    def dirty_regions(self, mode, image):
+        num_objs = len(self.objs)
+        regions = {}
 
+        if mode in ("PIE", "PIESCATTER", "PIEBW", "PIECOLOR"):
+            # Lines closer to the centre than the hub overlap their neighbours,
+            # and all but the scatter marks meet at the centre. Each changed
+            # line is repainted in pieces, in rings that narrow toward the
+            # centre, so only the small rect at the centre needs every line.
+            thickness = 2 if num_objs < 200 else 1
+            step = math.pi * 2 / num_objs
+            hub = min(thickness * num_objs / math.pi, 305)
+            radii = [45] if mode == "PIESCATTER" else [0, 4]
+            while radii[-1]*2 < hub:
+                radii.append(radii[-1]*2)
+            radii += [r for r in range(int(hub), 305, 32) if r > radii[-1]] + [305]
+            if radii[0] == 0:
+                centre = (800-radii[1]-3, 600-radii[1]-3, 2*radii[1]+7, 2*radii[1]+7)
+                if self.dirty:
+                    regions[centre] = set(range(num_objs))
+                radii = radii[1:]
+
+            for i in self.dirty:
+                for inner, outer in zip(radii, radii[1:]):
+                    points = [(800 + math.cos(step*(i+k/2)) * r, 600 + math.sin(step*(i+k/2)) * r)
+                        for k in (-1, 0, 1) for r in (inner, outer)]
+                    xs, ys = [p[0] for p in points], [p[1] for p in points]
+                    rect = pygame.Rect(min(xs)-3, min(ys)-3, max(xs)-min(xs)+7, max(ys)-min(ys)+7)
+
+                    # Every line whose angle falls between the corners of the
+                    # rect, widened by how far a line's pixels stray from its
+                    # angle, as seen from the centre may cross the rect.
+                    reach = rect.inflate(6, 6)
+                    deltas = [(math.atan2(y-600, x-800) - step*i + math.pi) % (math.pi*2) - math.pi
+                        for x in (reach.left, reach.right) for y in (reach.top, reach.bottom)]
+                    first = math.floor(min(deltas) / step) - 1
+                    last = math.ceil(max(deltas) / step) + 1
+                    if reach.collidepoint(800, 600) or last-first+1 >= num_objs:
+                        crossing = range(num_objs)
+                    else:
+                        crossing = (k % num_objs for k in range(i+first, i+last+1))
+                    regions.setdefault(tuple(rect), set()).update(crossing)
+
+        else:
+            if mode == "IMAGE":
+                if image is None:
+                    return {}
+                total_x_size = int(image.get_width() / image.get_height() * 550)
+                x_start, spill = 250, 2
+            else:
+                total_x_size = 1500
+                x_start, spill = 50, 1
+
+            for i in self.dirty:
+                x_min = int(total_x_size * i / num_objs + x_start)
+                x_max = int(total_x_size * (i+1) / num_objs + x_start) + spill
+                first = max(int((x_min-x_start) * num_objs / total_x_size) - 1, 0)
+                last = min(int((x_max-x_start) * num_objs / total_x_size) + 2, num_objs)
+                rect = (x_min, ELEMENTS_RECT[1], x_max-x_min, ELEMENTS_RECT[3])
+                regions.setdefault(rect, set()).update(range(first, last))
+
+        return regions
+
+    def draw_aux(self, window):
+        # Cells are drawn at the scale of the elements, so a buffer as long
+        # as them lines up under them, with at most one bar per pixel column.
+        window.fill(BLACK, AUX_RECT)
+        size = self.stats.aux
+        self.aux_drawn = size
+        if not size:
+            return
+        objs = self.objs.cells
+        num_objs = len(self.objs)
+        x_loc, y_loc = 50, AUX_RECT[1] + 5
+        width = 1500 * size / num_objs
+        pygame.draw.rect(window, GRAY_DARK, (x_loc, y_loc, width, 50))
+        window.blit(render_text(FONT_SMALL, "Aux", GRAY_LIGHT), (15, y_loc+18))
+        bars = min(size, int(width) + 1)
+        x_size = width / bars - (1 if num_objs < 200 else 0)
+        for bar in range(bars):
+            cell = num_objs + bar*size//bars
+            y_size = 45 * objs[cell] + 5
+            pygame.draw.rect(window, self.color_of(cell), (x_loc + width*bar/bars, y_loc+50-y_size, x_size, y_size))
+
+    def draw_elements(self, window, mode, image, indices=None):
+        objs = self.objs.cells
         num_objs = len(self.objs)
+        if indices is None:
+            if self.renderer is not None and mode in render.MODES:
+                self.renderer.draw(window, mode, objs[:num_objs], self.highlights, ROLE_COLORS, 1 if num_objs < 200 else 0)
+                return
+            indices = range(num_objs)
+
+        # The longest pie lines end on the first row of the buffer strip, so
+        # the elements are clipped to their area, the same way on the window
+        # and on the scratch surface.
+        window.set_clip(ELEMENTS_RECT)
+        color_of = self.color_of
+        lut = self.lookup(mode, window)
         if mode == "BARS":
             border = 1 if num_objs < 200 else 0
             x_size = 1500 / num_objs - border
-            for i, obj in enumerate(self.objs):
-                x_loc = 1500 * i / num_objs + 50
-                y_size = 500 * obj + 50
-                y_loc = 900 - y_size
-                pygame.draw.rect(window, self.colors[i], (x_loc, y_loc, x_size, y_size+5))
+            x_locs = lut["x"]
+            for i in indices:
+                # Down to the bottom of the area, whatever the truncated height.
+                y_loc = int(900 - (500*objs[i] + 50))
+                pygame.draw.rect(window, color_of(i), (x_locs[i], y_loc, x_size, 900-y_loc))
 
         elif mode == "SCATTERPLOT":
             x_size = 1500 / num_objs
-            for i, obj in enumerate(self.objs):
-                x_loc = 1500 * i / num_objs + 50
-                y_size = 500 * obj + 50
-                y_loc = 900 - y_size
-                pygame.draw.rect(window, self.colors[i], (x_loc, y_loc, x_size, 5))
+            x_locs = lut["x"]
+            for i in indices:
+                y_size = 500 * objs[i] + 50
+                pygame.draw.rect(window, color_of(i), (x_locs[i], 900-y_size, x_size, 5))
 
         elif mode == "BW":
             border = 1 if num_objs < 200 else 0
             x_size = 1500 / num_objs
-            for i, obj in enumerate(self.objs):
-                x_loc = 1500 * i / num_objs + 50
-                pygame.draw.rect(window, (255*obj,)*3, (x_loc, 350, x_size, 550))
-                if self.colors[i] != WHITE:
-                    pygame.draw.rect(window, self.colors[i], (x_loc, 350, x_size, 550), border+1)
+            x_locs = lut["x"]
+            for i in indices:
+                x_loc = x_locs[i]
+                pygame.draw.rect(window, (255*objs[i],)*3, (x_loc, 350, x_size, 550))
+                color = color_of(i)
+                if color != WHITE:
+                    pygame.draw.rect(window, color, (x_loc, 350, x_size, 550), border+1)
 
         elif mode == "COLOR":
             border = 1 if num_objs < 200 else 0
             x_size = 1500 / num_objs
-            for i, obj in enumerate(self.objs):
-                x_loc = 1500 * i / num_objs + 50
-                color = [255*x for x in colorsys.hsv_to_rgb(obj, 0.8, 0.8)]
-                pygame.draw.rect(window, color, (x_loc, 350, x_size, 550))
-                if self.colors[i] != WHITE:
-                    pygame.draw.rect(window, self.colors[i], (x_loc, 350, x_size, 550), border+1)
+            x_locs, hues = lut["x"], lut["hue"]
+            for i in indices:
+                x_loc = x_locs[i]
+                pygame.draw.rect(window, hues[objs[i]], (x_loc, 350, x_size, 550))
+                color = color_of(i)
+                if color != WHITE:
+                    pygame.draw.rect(window, color, (x_loc, 350, x_size, 550), border+1)
 
         elif mode == "PIE":
             thickness = 2 if num_objs < 200 else 1
-            for i, obj in enumerate(self.objs):
-                angle = math.pi * 2 / num_objs * i
-                length = obj * 250 + 50
-                x_loc, y_loc = math.cos(angle) * length, math.sin(angle) * length
-                pygame.draw.line(window, self.colors[i], (800, 600), (800+x_loc, 600+y_loc), thickness)
+            unit = lut["unit"]
+            for i in indices:
+                length = objs[i] * 250 + 50
+                cos, sin = unit[i]
+                pygame.draw.line(window, color_of(i), (800, 600), (800+cos*length, 600+sin*length), thickness)
 
         elif mode == "PIESCATTER":
             thickness = 2 if num_objs < 200 else 1
-            for i, obj in enumerate(self.objs):
-                angle = math.pi * 2 / num_objs * i
-                length = obj * 250 + 50
-                x_loc, y_loc = math.cos(angle) * (length-5), math.sin(angle) * (length-5)
-                x_loc2, y_loc2 = math.cos(angle) * length, math.sin(angle) * length
-                pygame.draw.line(window, self.colors[i], (800+x_loc, 600+y_loc), (800+x_loc2, 600+y_loc2), thickness)
+            unit = lut["unit"]
+            for i in indices:
+                length = objs[i] * 250 + 50
+                cos, sin = unit[i]
+                pygame.draw.line(window, color_of(i), (800+cos*(length-5), 600+sin*(length-5)),
+                    (800+cos*length, 600+sin*length), thickness)
 
         elif mode == "PIEBW":
             thickness = 2 if num_objs < 200 else 1
-            length = 300
-            for i, obj in enumerate(self.objs):
-                angle = math.pi * 2 / num_objs * i
-                x_loc, y_loc = math.cos(angle) * length, math.sin(angle) * length
-                color = (255*obj,)*3 if self.colors[i] == WHITE else self.colors[i]
-                pygame.draw.line(window, color, (800, 600), (800+x_loc, 600+y_loc), thickness)
+            ends = lut["end"]
+            for i in indices:
+                color = color_of(i)
+                if color == WHITE:
+                    color = (255*objs[i],)*3
+                pygame.draw.line(window, color, (800, 600), ends[i], thickness)
 
         elif mode == "PIECOLOR":
             thickness = 2 if num_objs < 200 else 1
-            length = 300
-            for i, obj in enumerate(self.objs):
-                angle = math.pi * 2 / num_objs * i
-                x_loc, y_loc = math.cos(angle) * length, math.sin(angle) * length
-                color = [255*x for x in colorsys.hsv_to_rgb(obj, 0.8, 0.8)] if self.colors[i] == WHITE else self.colors[i]
-                pygame.draw.line(window, color, (800, 600), (800+x_loc, 600+y_loc), thickness)
+            ends, hues = lut["end"], lut["hue"]
+            for i in indices:
+                color = color_of(i)
+                if color == WHITE:
+                    color = hues[objs[i]]
+                pygame.draw.line(window, color, (800, 600), ends[i], thickness)
 
         elif mode == "IMAGE":
             if image is not None:
                 total_x_size = int(image.get_width() / image.get_height() * 550)
                 x_size = total_x_size / num_objs + 1
-                scl_img = pygame.transform.scale(image, (total_x_size, 550))
-                for i, obj in enumerate(self.objs):
-                    x_loc = total_x_size * i / num_objs + 250
-                    try:
-                        img_x_pos = total_x_size * sorted(self.objs).index(obj) / num_objs
-                    except:
+                strips = self.image_strips(image, window)
+                ranks = self.ranks
+                for i in indices:
+                    rank = ranks.get(objs[i])
+                    if rank is None:
                         continue
 
-                    cropped = scl_img.subsurface((img_x_pos, 0, x_size, 550))
-                    window.blit(cropped, (x_loc, 350))
+                    x_loc = total_x_size * i / num_objs + 250
+                    window.blit(strips[rank], (x_loc, 350))
 
-                    if self.colors[i] != WHITE:
-                        pygame.draw.rect(window, self.colors[i], (x_loc, 350, x_size, 550), 1)
-
-        if not sorter.active:
-            if self.button_gen_objs.clicked(events):
-                self.gen_objs(self.slider_num_objs.value)
-            if self.button_random.clicked(events):
-                self.gen_objs(self.slider_num_objs.value)
-                self.shuffle()
+                    color = color_of(i)
+                    if color != WHITE:
+                        pygame.draw.rect(window, color, (x_loc, 350, x_size, 550), 1)
+        window.set_clip(None)
 
 
-class ObjAppearance:
-    scroll_speed = 10
-    choice_width = 30
+class ObjAppearance(ChoiceList):
     choices = (
         ("Bars", "BARS"),
         ("Scatterplot", "SCATTERPLOT"),
@@ -275,561 +713,515 @@ class ObjAppearance:
     )
 
     def __init__(self, loc, size, font):
-        self.loc = loc
-        self.size = size
-        self.font = font
-        self.offset = 0
-        self.sel_ind = 0
+        super().__init__(loc, size, font)
         self.image = None
+        self.thumbnail = None
         self.button_load_img = Button((loc[0]+size[0]+30, loc[1]), (100, 35), FONT_MED.render("Load Image", 1, BLACK))
 
     def draw(self, window, events):
         loc = self.loc
         size = self.size
-        surface = pygame.Surface(self.size)
-
-        for i, choice in enumerate(self.choices):
-            y_loc = self.choice_width*i + self.offset
-            color = CHOICE_LIGHT if i%2 == 0 else CHOICE_DARK
-            if i == self.sel_ind:
-                color = CHOICE_SELECT
-
-            pygame.draw.rect(surface, color, (0, y_loc, size[0], self.choice_width))
-            text = self.font.render(choice[0], 1, BLACK)
-            text_loc = ((size[0]-text.get_width()) // 2, y_loc + (self.choice_width-text.get_height())//2)
-            surface.blit(text, text_loc)
-
-        window.blit(surface, self.loc)
-        pygame.draw.rect(window, WHITE, self.loc+self.size, 2)
+        self.draw_list(window, events)
         if self.sel_ind == 8:
             self.button_load_img.draw(window, events)
             if self.image is not None:
-                window.blit(pygame.transform.scale(self.image, (150, 80)), (loc[0]+size[0]+30, loc[1]+50))
+                window.blit(self.thumbnail, (loc[0]+size[0]+30, loc[1]+50))
             if self.button_load_img.clicked(events):
                 path = askopenfilename()
                 if os.path.isfile(path):
                     self.image = pygame.image.load(path)
+                    self.thumbnail = pygame.transform.scale(self.image, (150, 80))
 
-        mouse_pos = pygame.mouse.get_pos()
-        if loc[0] <= mouse_pos[0] <= loc[0]+size[0] and loc[1] <= mouse_pos[1] <= loc[1]+size[1]:
-            for event in events:
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    if event.button == 1:
-                        index = (mouse_pos[1]-loc[1]-self.offset) // self.choice_width
-                        if 0 <= index < len(self.choices):
-                            self.sel_ind = index
 
-                    elif event.button == 4:
-                        self.offset += self.scroll_speed
-                    elif event.button == 5:
-                        self.offset -= self.scroll_speed
+class RaceLane:
+    """One algorithm of a race, run in its own process and drawn in its own pane."""
 
-        self.offset = min(self.offset, 0)
-        self.offset = max(self.offset, size[1] - len(self.choices)*self.choice_width)
+    def __init__(self, name, label, values, rect):
+        self.name = name
+        self.label = label
+        self.rect = rect
+        self.area = (rect[0]+50, rect[1]+25, rect[2]-100, rect[3]-30)
+        self.num_objs = len(values)
+        self.objs = array("d", values)
+        self.highlights = Highlights()
+        self.stats = OpCounter()
+        self.seconds = None
+        # The child is started last, so nothing that fails before it leaves it running.
+        self.renderer = render.ColumnRenderer(self.area[:2], self.area[2:]) if render is not None else None
+        self.runner = ProcessRun(name, values, self.stats)
+
+    def advance(self, target):
+        """Applies the operations up to the target count the child has got to so far."""
+        if self.runner is None:
+            return
+        ops = self.runner.drain(target - self.stats.ops)
+        objs = self.objs
+        # The counter has seen the whole batch, so its peak covers every ALLOC in it.
+        reserve(objs, self.num_objs + self.stats.peak_aux)
+        highlights = self.highlights
+        for kind, i, j, value in ops:
+            if kind == SWAP:
+                objs[i], objs[j] = objs[j], objs[i]
+                if highlights.pivots:
+                    highlights.follow(kind, i, j)
+            elif kind == WRITE:
+                objs[i] = value
+            elif kind == CHOOSE_PIVOT or kind == POP_RANGE:
+                highlights.follow(kind, i, j)
+        if ops:
+            self.highlights.clear()
+            kind, i, j, value = ops[-1]
+            self.highlights.mark_op(kind, i, j)
+
+        if self.runner.done():
+            self.seconds = self.runner.seconds
+            self.close()
+            self.highlights.reset()
+            self.highlights.mark_region(0, self.num_objs, SORTED)
+
+    def close(self):
+        if self.runner is not None:
+            self.runner.close()
+            self.runner = None
+
+    def draw(self, window, mode, result):
+        x, y, width, height = self.area
+        stats = self.stats
+        window.blit(render_text(FONT_MED, f"{self.label}    Comparisons: {stats.comp}    Writes: {stats.write}"
+            f"    Accesses: {stats.read}    Peak Aux: {stats.peak_aux}"
+            f"    Peak Depth: {stats.peak_depth}", WHITE), (x, self.rect[1]+5))
+        text = render_text(FONT_MED, result, WHITE)
+        window.blit(text, (x+width-text.get_width(), self.rect[1]+5))
+
+        num_objs = self.num_objs
+        border = 1 if num_objs < 200 else 0
+        if self.renderer is not None and mode in render.MODES:
+            self.renderer.draw(window, mode, self.objs[:num_objs], self.highlights, ROLE_COLORS, border)
+            return
+        x_size = width / num_objs - border
+        for i, value in enumerate(self.objs[:num_objs]):
+            role = self.highlights.role(i)
+            y_size = (500*value+50) * height / 550
+            pygame.draw.rect(window, WHITE if role is None else ROLE_COLORS[role],
+                (x + width*i/num_objs, y+height-y_size, x_size, y_size))
+
+
+class Race:
+    """
+    Several algorithms sorting the same elements side by side. They share one
+    clock counted in operations: no lane is given operations past the ones
+    the slowest running lane has reached, so the panes stay comparable at
+    any moment whichever process gets more of the processor.
+    """
+
+    def __init__(self, entries, values):
+        height = ELEMENTS_RECT[3] // len(entries)
+        self.lanes = []
+        try:
+            for k, (label, name) in enumerate(entries):
+                self.lanes.append(RaceLane(name, label, values, (ELEMENTS_RECT[0], ELEMENTS_RECT[1] + k*height,
+                    ELEMENTS_RECT[2], height)))
+        except BaseException:
+            self.stop()
+            raise
+        self.clock = 0
+
+    def running(self):
+        return [lane for lane in self.lanes if lane.runner is not None]
+
+    def done(self):
+        return not self.running()
+
+    def update(self, due, deadline):
+        running = self.running()
+        while due > 0 and running and time.perf_counter() < deadline:
+            target = self.clock + min(due, OPS_CHUNK)
+            for lane in running:
+                lane.advance(target)
+            running = self.running()
+            clock = min((lane.stats.ops for lane in running), default=target)
+            if clock == self.clock:
+                break
+            due -= clock - self.clock
+            self.clock = clock
+
+    def stop(self):
+        for lane in self.lanes:
+            lane.close()
+
+    def draw(self, window, mode):
+        # On the shared clock the lanes finish in order of their operation
+        # counts, while the processor times are only all known at the end.
+        finished = [lane for lane in self.lanes if lane.seconds is not None]
+        by_ops = sorted(finished, key=lambda lane: lane.stats.ops)
+        by_time = sorted(finished, key=lambda lane: lane.seconds) if len(finished) == len(self.lanes) else []
+        for lane in self.lanes:
+            if lane.runner is not None:
+                result = "Running"
+            elif lane.seconds is None:
+                result = "Stopped"
+            else:
+                ops_rank = 1 + [l.stats.ops for l in by_ops].index(lane.stats.ops)
+                result = f"{lane.seconds*1000:.4g} ms    #{ops_rank} in operations"
+                if by_time:
+                    time_rank = 1 + [l.seconds for l in by_time].index(lane.seconds)
+                    result += f", #{time_rank} in time"
+            lane.draw(window, mode, result)
 
 
-class Sorter:
-    scroll_speed = 10
-    choice_width = 30
-    choices = (
-        ("Bubble", "sort_bubble"),
-        ("Bubble Optimized", "sort_bubble_optimize"),
-        ("Cocktail", "sort_cocktail"),
-        ("Cocktail Optimized", "sort_cocktail_optimize"),
-        ("Gnome", "sort_gnome"),
-        ("Insertion", "sort_insertion"),
-        ("Selection", "sort_selection"),
-        ("Shell", "sort_shell"),
-        ("Comb", "sort_comb"),
-        ("Cycle", "sort_cycle"),
-    )
-    
+class Sorter(ChoiceList):
+    choices = algorithms.CHOICES
+
     def __init__(self, loc, size, font):
-        self.loc = loc
-        self.size = size
-        self.font = font
-        self.offset = 0
-        self.sel_ind = 0
+        super().__init__(loc, size, font)
         self.button = Button((loc[0]+size[0]+20, loc[1]), (100, 35), FONT_MED.render("Sort", 1, BLACK))
         self.button_stop = Button((loc[0]+size[0]+20, loc[1]+50), (100, 35), FONT_MED.render("Stop", 1, BLACK))
+        self.button_save = Button((loc[0]+size[0]+20, loc[1]+100), (100, 35), FONT_MED.render("Save Trace", 1, BLACK))
+        self.button_load = Button((loc[0]+size[0]+20, loc[1]+150), (100, 35), FONT_MED.render("Load Trace", 1, BLACK))
+        self.button_pause = Button((loc[0], loc[1]+208), (80, 30), FONT_MED.render("Pause", 1, BLACK))
+        self.button_play = Button((loc[0], loc[1]+208), (80, 30), FONT_MED.render("Play", 1, BLACK))
+        self.button_back = Button((loc[0]+90, loc[1]+208), (80, 30), FONT_MED.render("< Step", 1, BLACK))
+        self.button_forward = Button((loc[0]+180, loc[1]+208), (80, 30), FONT_MED.render("Step >", 1, BLACK))
+        self.button_end = Button((loc[0]+270, loc[1]+208), (80, 30), FONT_MED.render("End", 1, BLACK))
+        self.slider_position = Slider((loc[0]+380, loc[1]+212), (880, 10), 7, FONT_SMALL, "Step", 0, (0, 1))
+        self.button_local = Button((540, 100), (150, 35), FONT_MED.render("Run: Main Loop", 1, BLACK))
+        self.button_process = Button((540, 100), (150, 35), FONT_MED.render("Run: Process", 1, BLACK))
+        self.in_process = False
+        self.button_single = Button((540, 50), (140, 35), FONT_MED.render("Mode: Single", 1, BLACK))
+        self.button_race = Button((540, 50), (140, 35), FONT_MED.render("Mode: Race", 1, BLACK))
+        self.race_mode = False
+        self.racers = set()
+        self.race = None
         self.active = False
+        self.paused = False
+        self.runner = None
+        self.run_args = None
+        self.trace_file = None
+        self.writer = None
+        self.pacer = None
+        self.trace = None
+        # Cells and counters at the end of a cached run being played.
+        self.end = None
+        self.traces = TraceCache()
+        self.meter = RateMeter()
         self.time_start = 0
 
-    def draw(self, window, events, objects: Objects):
-        loc = self.loc
-        size = self.size
-        surface = pygame.Surface(self.size)
+    def select(self, index):
+        # In race mode every click adds or removes an entrant, up to as many
+        # as there are panes.
+        self.sel_ind = index
+        if self.race_mode and (index in self.racers or len(self.racers) < MAX_RACERS):
+            self.racers ^= {index}
 
-        for i, choice in enumerate(self.choices):
-            y_loc = self.choice_width*i + self.offset
-            color = CHOICE_LIGHT if i%2 == 0 else CHOICE_DARK
-            if i == self.sel_ind:
-                color = CHOICE_SELECT
+    def selected(self, i):
+        return i in self.racers if self.race_mode else i == self.sel_ind
 
-            pygame.draw.rect(surface, color, (0, y_loc, size[0], self.choice_width))
-            text = self.font.render(choice[0], 1, BLACK)
-            text_loc = ((size[0]-text.get_width()) // 2, y_loc + (self.choice_width-text.get_height())//2)
-            surface.blit(text, text_loc)
+    def selection(self):
+        return (self.sel_ind, self.race_mode, frozenset(self.racers))
 
-        window.blit(surface, self.loc)
-        pygame.draw.rect(window, WHITE, self.loc+self.size, 2)
+    def draw(self, window, events, objects: Objects):
+        self.draw_list(window, events)
         self.button.draw(window, events)
         self.button_stop.draw(window, events)
-
-        mouse_pos = pygame.mouse.get_pos()
-        if loc[0] <= mouse_pos[0] <= loc[0]+size[0] and loc[1] <= mouse_pos[1] <= loc[1]+size[1]:
-            for event in events:
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    if event.button == 1:
-                        index = (mouse_pos[1]-loc[1]-self.offset) // self.choice_width
-                        if 0 <= index < len(self.choices):
-                            self.sel_ind = index
-
-                    elif event.button == 4:
-                        self.offset += self.scroll_speed
-                    elif event.button == 5:
-                        self.offset -= self.scroll_speed
-
-        self.offset = min(self.offset, 0)
-        self.offset = max(self.offset, size[1] - len(self.choices)*self.choice_width)
+        self.button_save.draw(window, events)
+        self.button_load.draw(window, events)
+        button_mode = self.button_race if self.race_mode else self.button_single
+        button_mode.draw(window, events)
+        button_where = self.button_process if self.in_process else self.button_local
+        if not self.race_mode:
+            button_where.draw(window, events)
+        self.draw_timeline(window, events, objects)
 
         if self.button.clicked(events) and not self.active:
-            objects.reset_stats()
-            func = getattr(self, self.choices[self.sel_ind][1])
-            self.active = True
-            self.time_start = time.time()
-            threading.Thread(target=func, args=(objects,)).start()
-        if self.button_stop.clicked(events):
-            self.active = False
-
-    def sort_bubble(self, objects: Objects):
-        elements = objects.objs[:]
-        num_elements = len(elements)
-        clock = pygame.time.Clock()
-
-        done = False
-        while not done:
-            done = True
-            for i in range(num_elements-1):
-                clock.tick(objects.slider_speed.value)
-                if not self.active:
-                    return
-                
-                objects.stats_comp += 1
-                objects.stats_read += 2
-                objects.colors = [WHITE for i in range(num_elements)]
-                objects.colors[i] = RED
-                objects.colors[i+1] = GREEN
-
-                if elements[i] > elements[i+1]:
-                    done = False
-                    elements[i], elements[i+1] = elements[i+1], elements[i]
-
-                    objects.stats_read += 2
-                    objects.stats_write += 2
-
-                objects.set_objs(elements)
-
-        objects.colors = [BLUE for i in range(num_elements)]
-        self.active = False
-
-    def sort_bubble_optimize(self, objects: Objects):
-        elements = objects.objs[:]
-        num_elements = len(elements)
-        clock = pygame.time.Clock()
-
-        done = False
-        end = num_elements - 1
-        while not done:
-            done = True
-            for i in range(max(end, 1)):
-                clock.tick(objects.slider_speed.value)
-                if not self.active:
-                    return
-                
-                objects.stats_comp += 1
-                objects.stats_read += 2
-                objects.colors = [WHITE for i in range(num_elements)]
-                objects.colors[i] = RED
-                objects.colors[i+1] = GREEN
-
-                if elements[i] > elements[i+1]:
-                    done = False
-                    elements[i], elements[i+1] = elements[i+1], elements[i]
-
-                    objects.stats_read += 2
-                    objects.stats_write += 2
-                
-                objects.set_objs(elements)
-            
-            end -= 1
-        
-        objects.colors = [BLUE for i in range(num_elements)]
-        self.active = False
-
-    def sort_cocktail(self, objects: Objects):
-        elements = objects.objs[:]
-        num_elements = len(elements)
-        clock = pygame.time.Clock()
-
-        done = False
-        while not done:
-            done = True
-            
-            for i in range(num_elements-1):
-                clock.tick(objects.slider_speed.value)
-                if not self.active:
-                    return
-
-                objects.stats_comp += 1
-                objects.stats_read += 2
-                objects.colors = [WHITE for i in range(num_elements)]
-                objects.colors[i] = RED
-                objects.colors[i+1] = GREEN
-
-                if elements[i] > elements[i+1]:
-                    done = False
-                    elements[i], elements[i+1] = elements[i+1], elements[i]
-
-                    objects.stats_read += 2
-                    objects.stats_write += 2
-                
-                objects.set_objs(elements)
-
-            for i in reversed(range(1, num_elements)):
-                clock.tick(objects.slider_speed.value)
-                if not self.active:
-                    return
-
-                objects.stats_comp += 1
-                objects.stats_read += 2
-                objects.colors = [WHITE for i in range(num_elements)]
-                objects.colors[i] = RED
-                objects.colors[i-1] = GREEN
-
-                if elements[i] < elements[i-1]:
-                    done = False
-                    elements[i], elements[i-1] = elements[i-1], elements[i]
-
-                    objects.stats_read += 2
-                    objects.stats_write += 2
-                
-                objects.set_objs(elements)
-        
-        objects.colors = [BLUE for i in range(num_elements)]
-        self.active = False
-
-    def sort_cocktail_optimize(self, objects: Objects):
-        elements = objects.objs[:]
-        num_elements = len(elements)
-        clock = pygame.time.Clock()
-
-        done = False
-        start = 0
-        end = num_elements - 1
-        while not done:
-            done = True
-            
-            for i in range(start, end):
-                clock.tick(objects.slider_speed.value)
-                if not self.active:
-                    return
-
-                objects.stats_comp += 1
-                objects.stats_read += 2
-                objects.colors = [WHITE for i in range(num_elements)]
-                objects.colors[i] = RED
-                objects.colors[i+1] = GREEN
-
-                if elements[i] > elements[i+1]:
-                    done = False
-                    elements[i], elements[i+1] = elements[i+1], elements[i]
-
-                    objects.stats_read += 2
-                    objects.stats_write += 2
-                
-                objects.set_objs(elements)
-
-            for i in reversed(range(start+1, end+1)):
-                clock.tick(objects.slider_speed.value)
-                if not self.active:
-                    return
-
-                objects.stats_comp += 1
-                objects.stats_read += 2
-                objects.colors = [WHITE for i in range(num_elements)]
-                objects.colors[i] = RED
-                objects.colors[i-1] = GREEN
-
-                if elements[i] < elements[i-1]:
-                    done = False
-                    elements[i], elements[i-1] = elements[i-1], elements[i]
-
-                    objects.stats_read += 2
-                    objects.stats_write += 2
-                
-                objects.set_objs(elements)
-
-            start += 1
-            end -= 1
-        
-        objects.colors = [BLUE for i in range(num_elements)]
-        self.active = False
-
-    def sort_gnome(self, objects: Objects):
-        elements = objects.objs[:]
-        num_elements = len(elements)
-        clock = pygame.time.Clock()
-
-        i = 0
-        while i < num_elements:
-            clock.tick(objects.slider_speed.value)
-            if not self.active:
-                return
-
-            objects.colors = [WHITE for i in range(num_elements)]
-            objects.colors[i] = GREEN
-            if i > 0:
-                objects.colors[i-1] = RED
-            objects.stats_read += 2
-            objects.stats_comp += 1
-
-            if i == 0:
-                i += 1
-            if elements[i] >= elements[i-1]:
-                i += 1
+            if self.race_mode:
+                if self.racers:
+                    self.start_race(objects)
             else:
-                objects.stats_read += 2
-                objects.stats_write += 2
-                elements[i], elements[i-1] = elements[i-1], elements[i]
-                i -= 1
-
-            objects.set_objs(elements)
-        
-        objects.colors = [BLUE for i in range(num_elements)]
-        self.active = False
-
-    def sort_insertion(self, objects: Objects):
-        elements = objects.objs[:]
-        num_elements = len(elements)
-        clock = pygame.time.Clock()
-
-        for i in range(1, num_elements):
-            clock.tick(objects.slider_speed.value)
-            if not self.active:
-                return
-
-            key = elements[i]
-            j = i - 1
-            while j >= 0 and key < elements[j]:
-                objects.stats_read += 2
-                objects.stats_write += 1
-                objects.stats_comp += 1
-                elements[j+1] = elements[j]
-                j -= 1
-            elements[j+1] = key
-
-            objects.colors = [WHITE for i in range(num_elements)]
-            objects.colors[i] = GREEN
-            objects.stats_read += 1
-            objects.stats_write += 1
-            objects.colors[j+1] = RED
-            objects.set_objs(elements)
-        
-        objects.colors = [BLUE for i in range(num_elements)]
-        self.active = False
-
-    def sort_selection(self, objects: Objects):
-        elements = objects.objs[:]
-        num_elements = len(elements)
-        clock = pygame.time.Clock()
-
-        for i in range(num_elements):
-            clock.tick(objects.slider_speed.value)
-            if not self.active:
-                return
-
-            min_index = i
-            for j in range(i+1, num_elements):
-                objects.stats_read += 2
-                objects.stats_comp += 1
-                if elements[min_index] > elements[j]:
-                    min_index = j
-
-            elements[i], elements[min_index] = elements[min_index], elements[i]
-
-            objects.colors = [WHITE for i in range(num_elements)]
-            objects.colors[i] = GREEN
-            objects.colors[min_index] = RED
-            objects.stats_read += 2
-            objects.stats_write += 2
-            objects.set_objs(elements)
-        
-        objects.colors = [BLUE for i in range(num_elements)]
-        self.active = False
-
-    def sort_shell(self, objects: Objects):
-        elements = objects.objs[:]
-        num_elements = len(elements)
-        clock = pygame.time.Clock()
-
-        gap = num_elements // 2
-        while gap > 0:
-            for i in range(gap, num_elements):
-                clock.tick(objects.slider_speed.value)
-                if not self.active:
-                    return
-
-                objects.colors = [WHITE for i in range(num_elements)]
-                objects.colors[i] = RED
-                
-                objects.stats_read += 1
-                tmp = elements[i]
-                j = i
-                while j >= gap and elements[j-gap] > tmp:
-                    if not self.active:
+                name = self.choices[self.sel_ind][1]
+                values = objects.objs.copy()
+                cached = self.traces.get(name, values)
+                self.trace = None
+                if cached is not None:
+                    self.trace, end = cached
+                    try:
+                        self.play(objects, TraceReader(self.trace), unpack_end(end) if end is not None else None)
+                    except (TraceError, IndexError, ValueError):
+                        self.trace = None
+                if self.trace is None:
+                    self.start(objects, name, values)
+        if self.button_stop.clicked(events):
+            self.stop()
+
+        if not self.active:
+            if button_mode.clicked(events):
+                self.race_mode = not self.race_mode
+                self.race = None
+                objects.redraw()
+            if button_where.clicked(events) and not self.race_mode:
+                self.in_process = not self.in_process
+            if self.button_save.clicked(events) and self.trace is not None:
+                path = asksaveasfilename(defaultextension=".svt", filetypes=(("Sort traces", "*.svt"),))
+                if path:
+                    with open(path, "wb") as file:
+                        file.write(self.trace)
+            if self.button_load.clicked(events):
+                path = askopenfilename(filetypes=(("Sort traces", "*.svt"),))
+                if os.path.isfile(path):
+                    try:
+                        self.replay(objects, TraceReader.load(path))
+                    except (OSError, TraceError):
                         return
 
-                    elements[j] = elements[j-gap]
-                    j -= gap
-
-                    objects.set_objs(elements)
-                    objects.stats_write += 1
-                    objects.stats_read += 2
-                    objects.stats_comp += 2
-                    objects.colors = [WHITE for i in range(num_elements)]
-                    objects.colors[j] = RED
-                    objects.colors[j-gap] = GREEN
-                
-                elements[j] = tmp
-            gap //= 2
-        
-        objects.colors = [BLUE for i in range(num_elements)]
-        self.active = False
-
-    def sort_comb(self, objects: Objects):
-        def next_gap(gap):
-            gap = gap * 10 / 13
-            if gap < 1:
-                return 1
-            return int(gap)
-
-        elements = objects.objs[:]
-        num_elements = len(elements)
-        clock = pygame.time.Clock()
-
-        gap = num_elements
-        swapped = True
-        while gap != 1 or swapped:
-            gap = next_gap(gap)
-            swapped = False
-
-            for i in range(num_elements-gap):
-                clock.tick(objects.slider_speed.value)
-                if not self.active:
-                    return
-
-                objects.colors = [WHITE for i in range(num_elements)]
-                objects.colors[i] = RED
-                objects.colors[i+gap] = GREEN
-                objects.stats_comp += 1
-                objects.stats_read += 2
-                objects.stats_write += 2
-
-                if elements[i] > elements[i+gap]:
-                    elements[i], elements[i+gap] = elements[i+gap], elements[i]
-                    swapped = True
-
-                objects.set_objs(elements)
-        
-        objects.colors = [BLUE for i in range(num_elements)]
-        self.active = False
+    def draw_timeline(self, window, events, objects: Objects):
+        button_play = self.button_play if self.paused or not self.active else self.button_pause
+        button_play.draw(window, events)
+        if self.race is not None:
+            # A race is not recorded, so it can only be paused.
+            if button_play.clicked(events):
+                if self.paused:
+                    self.resume()
+                else:
+                    self.pause()
+            return
+        self.button_back.draw(window, events)
+        self.button_forward.draw(window, events)
+        self.button_end.draw(window, events)
+
+        timeline = objects.timeline
+        slider = self.slider_position
+        slider.range = (timeline.start, max(len(timeline), timeline.start+1))
+        slider.val_dist = slider.range[1] - slider.range[0]
+        if not slider.dragging:
+            slider.value = objects.position
+        slider.draw(window, events)
+        if timeline.start > 0:
+            # A long run only keeps its recent past, see Timeline.
+            text = render_text(FONT_SMALL, f"Steps before {timeline.start} were dropped, at most {timeline.limit} are kept",
+                GRAY_LIGHT)
+            window.blit(text, (slider.loc[0]+slider.size[0]-text.get_width(), slider.loc[1]+slider.size[1]+7))
+
+        if slider.dragging:
+            self.pause()
+            position = max(min(slider.value, len(timeline)), timeline.start)
+            if position != objects.position:
+                objects.seek(position)
+        if button_play.clicked(events):
+            if self.paused:
+                self.resume()
+            elif self.active:
+                self.pause()
+            elif objects.position < len(objects.timeline):
+                # Plays the rest of a recorded run again without an algorithm.
+                self.pacer = Pacer(objects.slider_speed.value)
+                self.active = True
+                self.paused = False
+        if self.button_back.clicked(events):
+            self.pause()
+            objects.step_back()
+        if self.button_forward.clicked(events):
+            self.pause()
+            objects.consume(self.runner, 1)
+        if self.button_end.clicked(events):
+            if self.end is not None and isinstance(self.runner, Playback):
+                # A cached run goes straight to its end, without decoding the
+                # steps up to it, and finishes there.
+                cells, stats = self.end
+                self.end_run(True)
+                objects.jump(stats.ops, cells, stats)
+                self.paused = False
+            elif objects.position < len(timeline):
+                self.pause()
+                objects.seek(len(timeline))
+
+    def pause(self):
+        if self.active:
+            self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+    def replay(self, objects: Objects, trace):
+        names = [choice[1] for choice in self.choices]
+        if trace.name in names:
+            self.sel_ind = names.index(trace.name)
+        objects.load(trace.values)
+        self.trace = trace.data
+        self.play(objects, trace)
+
+    def play(self, objects: Objects, trace, end=None):
+        # A run that was already computed is decoded as it plays, and read
+        # ahead in whatever is left of each frame, so it can soon be
+        # scrubbed. With its end known, End shows that right away.
+        objects.reset_timeline()
+        self.end = end
+        self.race = None
+        self.runner = Playback(trace)
+        self.writer = None
+        self.pacer = Pacer(objects.slider_speed.value)
+        self.active = True
+        self.paused = False
+        self.time_start = time.time()
+
+    def start(self, objects: Objects, name, values):
+        # The algorithm only advances when the main loop asks for its next
+        # operations, so pausing or stopping it needs no coordination.
+        objects.reset_timeline()
+        self.end = None
+        self.race = None
+        if self.in_process:
+            # The child records the trace itself, leaving the main loop only
+            # the drawing.
+            self.writer = None
+            self.runner = ProcessRun(name, values, record=True)
+        else:
+            self.trace_file = tempfile.TemporaryFile()
+            self.writer = TraceWriter(self.trace_file, name, values)
+            self.runner = Run(algorithms.lookup(name), values, self.writer)
+        self.run_args = (name, values)
+        self.pacer = Pacer(objects.slider_speed.value)
+        self.active = True
+        self.paused = False
+        self.time_start = time.time()
+
+    def start_race(self, objects: Objects):
+        # Every entrant gets its own process and a copy of the same elements.
+        self.race = Race([self.choices[i] for i in sorted(self.racers)], objects.objs.copy())
+        self.pacer = Pacer(objects.slider_speed.value)
+        self.active = True
+        self.paused = False
+        self.time_start = time.time()
+
+    def end_run(self, completed, timeline=None):
+        runner = self.runner
+        runner.close()
+        self.runner = None
+        if isinstance(runner, ProcessRun):
+            self.trace = runner.trace
+        elif self.writer is not None:
+            self.writer.flush()
+            self.trace_file.seek(0)
+            self.trace = self.trace_file.read()
+            self.trace_file.close()
+            self.writer = None
+        else:
+            # A recorded run that was played has nothing more to keep.
+            return
+        # Only complete runs are cached, with the cells and counters the
+        # timeline ends with; a stopped one can still be saved.
+        if completed:
+            self.traces.put(*self.run_args, self.trace, pack_end(timeline.tail, timeline.counter))
+
+    def show_rate(self, objects: Objects, due, applied):
+        # The speed asked for can be more than fits in the frames, so the
+        # rate reached is shown next to it while operations are dropped.
+        meter = self.meter
+        if not self.active or self.paused:
+            meter.reset()
+        else:
+            meter.add(due, applied)
+        objects.slider_speed.note = f" (reached {meter.rate:.0f})" if meter.short else ""
+
+    def update(self, objects: Objects):
+        if not self.active:
+            self.show_rate(objects, 0, 0)
+            return
+        self.pacer.rate = objects.slider_speed.value
+        due = self.pacer.take()
+        if self.race is not None:
+            clock = self.race.clock
+            if not self.paused:
+                self.race.update(due, time.perf_counter() + OPS_BUDGET)
+            self.show_rate(objects, due, self.race.clock - clock)
+            if self.race.done():
+                self.active = False
+                self.paused = False
+            return
+        deadline = time.perf_counter() + OPS_BUDGET
+        applied = 0
+        if not self.paused:
+            # Whatever is due but does not fit in the frame is dropped rather
+            # than carried over, so the pace never turns into a burst. The
+            # budget covers running the algorithm as well as applying it.
+            while applied < due and time.perf_counter() < deadline:
+                consumed = objects.consume(self.runner, min(due-applied, OPS_CHUNK))
+                if not consumed:
+                    break
+                applied += consumed
+        self.show_rate(objects, due, applied)
+        # A recorded run is read ahead in the rest of the budget, but not so
+        # far that the timeline drops the step being shown.
+        if isinstance(self.runner, Playback):
+            while not self.runner.done() and time.perf_counter() < deadline:
+                room = objects.timeline.room(objects.position)
+                if room <= 0:
+                    break
+                objects.timeline.extend(self.runner.drain(min(room, OPS_CHUNK)))
+
+        if self.runner is not None and self.runner.done():
+            self.end_run(self.runner.finished, objects.timeline)
+        if objects.position == len(objects.timeline) and self.runner is None and not self.paused:
+            objects.finish()
+            self.active = False
 
-    def sort_cycle(self, objects: Objects):
-        elements = objects.objs[:]
-        num_elements = len(elements)
-        clock = pygame.time.Clock()
-
-        for start in range(0, num_elements-1):
-            objects.stats_read += 3
-            objects.stats_write += 2
-
-            item = elements[start]
-            pos = start
-
-            for i in range(start+1, num_elements):
-                objects.stats_read += 1
-                objects.stats_comp += 1
-
-                if elements[i] < item:
-                    pos += 1
-            
-            if pos == start:
-                continue
-
-            while item == elements[pos]:
-                objects.stats_read += 1
-                objects.stats_comp += 1
-
-                pos += 1
-
-            objects.colors = [WHITE for i in range(num_elements)]
-            objects.colors[pos] = RED
-            elements[pos], item = item, elements[pos]
-
-            while pos != start:
-                clock.tick(objects.slider_speed.value)
-                if not self.active:
-                    return
-
-                pos = start
-                for i in range(start+1, num_elements):
-                    objects.stats_comp += 1
-                    objects.stats_read += 1
-                    if elements[i] < item:
-                        pos += 1
-                
-                while item == elements[pos]:
-                    objects.stats_comp += 1
-                    objects.stats_read += 1
-                    pos += 1
-
-                objects.stats_read += 2
-                objects.stats_write += 2
-                objects.colors = [WHITE for i in range(num_elements)]
-                objects.colors[pos] = RED
-
-                elements[pos], item = item, elements[pos]
-
-                objects.set_objs(elements)
-        
-        objects.colors = [BLUE for i in range(num_elements)]
+    def stop(self):
+        if self.runner is not None:
+            self.end_run(False)
+        if self.race is not None:
+            self.race.stop()
         self.active = False
+        self.paused = False
 
 
 def main():
+    Tk().withdraw()
     pygame.display.set_caption("Sorting Visualizer - Version 3")
     pygame.display.set_icon(pygame.image.load("icon.png"))
     WINDOW = pygame.display.set_mode(SCREEN)
 
     clock = pygame.time.Clock()
     objects = Objects(50)
+    # Measuring this computer the first time takes about a second, which is
+    # done before the loop rather than in a frame, and timed without the
+    # drawing competing for the processor.
+    if not costmodel.is_cached():
+        WINDOW.fill(BLACK)
+        WINDOW.blit(render_text(FONT_MED, "Measuring this computer for Est. Time...", WHITE), (50, 50))
+        pygame.display.update()
+    objects.costs = costmodel.load()
     sorter = Sorter((50, 50), (150, 200), FONT_MED)
     appear = ObjAppearance((700, 50), (150, 200), FONT_MED)
     while True:
         clock.tick(FPS)
-        pygame.display.update()
         events = pygame.event.get()
         for event in events:
             if event.type == pygame.QUIT:
-                sorter.active = False
+                sorter.stop()
                 pygame.quit()
                 return
 
-        WINDOW.fill(BLACK)
+        sorter.update(objects)
+        mode = appear.choices[appear.sel_ind][1]
+        incremental = objects.incremental
+        if incremental:
+            WINDOW.fill(BLACK, CONTROLS_RECT)
+        else:
+            WINDOW.fill(BLACK)
         sorter.draw(WINDOW, events, objects)
-        objects.draw(WINDOW, events, appear.choices[appear.sel_ind][1], sorter, appear.image)
+        objects.draw(WINDOW, events, sorter)
         appear.draw(WINDOW, events)
 
-
-main()
\ No newline at end of file
+        if sorter.race is not None:
+            if incremental:
+                WINDOW.fill(BLACK, ELEMENTS_RECT)
+            sorter.race.draw(WINDOW, mode)
+            pygame.display.update()
+        elif incremental:
+            pygame.display.update([CONTROLS_RECT] + objects.draw_changes(WINDOW, mode, appear.image))
+        else:
+            objects.draw_elements(WINDOW, mode, appear.image)
+            objects.draw_aux(WINDOW)
+            pygame.display.update()
+
+
+if __name__ == "__main__":
+    main()